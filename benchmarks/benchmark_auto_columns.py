@@ -0,0 +1,92 @@
+"""
+Benchmark the stored and the virtual auto columns, run with `make benchmark`.
+
+The generated data has several timestamp columns, it is imported without auto columns, with stored auto columns
+and with virtual auto columns, in a separate process each. The import time, the size of the database and the latency
+of a query grouped by an auto column are compared.
+"""
+
+import argparse
+import statistics
+import tempfile
+import time
+from multiprocessing import Pool
+from unittest import mock
+
+import duckdb
+
+from own_your_data.components.import_file import run_import
+from own_your_data.utils import initial_load
+
+AUTO_COLUMNS_SCENARIOS = {
+    "no auto columns": {"add_auto_columns": False},
+    "stored auto columns": {"add_auto_columns": True},
+    "virtual auto columns": {"add_auto_columns": True, "virtual_auto_columns": True},
+}
+
+
+def generate_parquet(file_path: str, number_rows: int):
+    duckdb.execute(
+        f"""
+        copy (select '2015-01-01'::timestamp + to_minutes((hash(range) % (10 * 365 * 24 * 60))::bigint) as created_at,
+            created_at + to_hours((hash(range, 1) % 48)::bigint) as confirmed_at,
+            confirmed_at + to_days((hash(range, 2) % 10)::bigint) as shipped_at,
+            shipped_at + to_days((hash(range, 3) % 10)::bigint) as delivered_at,
+            ['LIDL', 'CARREFOUR', 'ALDI', 'WALMART'][range % 4 + 1] as store,
+            (hash(range, 4) % 500) / 100 as amount
+          from range({number_rows})) to '{file_path}' (format parquet)
+        """
+    )
+
+
+def run_scenario(scenario: str, file_path: str) -> dict:
+    with tempfile.TemporaryDirectory() as database_dir:
+        duckdb_conn = duckdb.connect(f"{database_dir}/benchmark.db")
+        with mock.patch("own_your_data.components.import_file.get_duckdb_conn", return_value=duckdb_conn), mock.patch(
+            "own_your_data.utils.get_duckdb_conn", return_value=duckdb_conn
+        ):
+            initial_load()
+            start_time = time.perf_counter()
+            run_import(
+                data_source=[file_path],
+                file_name=file_path,
+                table_name="file_benchmark",
+                **AUTO_COLUMNS_SCENARIOS[scenario],
+            )
+            duckdb_conn.execute("checkpoint")
+            import_time = time.perf_counter() - start_time
+            used_size = duckdb_conn.execute(
+                "select used_blocks * block_size from pragma_database_size() where database_name = 'benchmark'"
+            ).fetchone()[0]
+            query_times = []
+            if scenario != "no auto columns":
+                for _ in range(3):
+                    start_time = time.perf_counter()
+                    duckdb_conn.execute(
+                        """
+                        select "Shipped At Month Name Auto", "Delivered At Year Auto", sum("Amount")
+                        from file_benchmark_t
+                        group by all
+                        """
+                    ).fetchall()
+                    query_times.append(time.perf_counter() - start_time)
+        duckdb_conn.close()
+        return {
+            "scenario": scenario,
+            "import (s)": round(import_time, 1),
+            "used blocks (MiB)": round(used_size / pow(1024, 2)),
+            "group by auto columns (ms)": round(statistics.median(query_times) * 1000, 1) if query_times else None,
+        }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as benchmark_dir:
+        parquet_file_path = f"{benchmark_dir}/benchmark.parquet"
+        generate_parquet(file_path=parquet_file_path, number_rows=args.rows)
+        for scenario_name in AUTO_COLUMNS_SCENARIOS:
+            with Pool(1) as pool:
+                print(pool.apply(run_scenario, (scenario_name, parquet_file_path)))
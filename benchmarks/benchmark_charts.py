@@ -0,0 +1,111 @@
+"""
+Benchmark the queries needed to build a chart, run with `make benchmark`.
+
+The generated csv file is imported once, after which every chart is built with an empty result cache.
+The connection counts the statements which read the imported table, next to the time to build the chart.
+"""
+
+import argparse
+import statistics
+import tempfile
+import time
+from unittest import mock
+
+import duckdb
+import plotly.express as px
+
+from benchmarks.benchmark_import import generate_csv
+from own_your_data.charts.definition import BarChart
+from own_your_data.charts.definition import LineChart
+from own_your_data.charts.definition import ScatterChart
+from own_your_data.components.import_file import run_import
+from own_your_data.utils import get_result_cache
+from own_your_data.utils import initial_load
+
+CHARTS = {
+    "bar with color": (
+        BarChart,
+        {
+            "dim_columns": ["Store"],
+            "color_column": "Category",
+            "orientation": "v",
+            "color_scheme": px.colors.qualitative.Plotly,
+        },
+    ),
+    "line with color": (
+        LineChart,
+        {"dim_columns": ["Register Date Date Auto"], "color_column": "Category", "orientation": None},
+    ),
+    "scatter with color": (
+        ScatterChart,
+        {
+            "dim_columns": ["Register Date Month Name Auto", "Store"],
+            "color_column": "Category",
+            "orientation": None,
+            "color_scheme": px.colors.sequential.Mint,
+        },
+    ),
+}
+
+
+class CountingConnection:
+    # counts the statements which read the table, everything else is passed to the duckdb connection
+
+    def __init__(self, duckdb_conn: duckdb.DuckDBPyConnection, table_name: str, parent=None):
+        self.duckdb_conn = duckdb_conn
+        self.table_name = table_name
+        self.table_statements = 0
+        self.parent = parent
+
+    def execute(self, sql_query: str, *args, **kwargs):
+        if self.table_name in sql_query:
+            (self.parent or self).table_statements += 1
+        return self.duckdb_conn.execute(sql_query, *args, **kwargs)
+
+    def cursor(self):
+        # the queries run on a cursor of their own, its statements are counted by the connection
+        return CountingConnection(duckdb_conn=self.duckdb_conn.cursor(), table_name=self.table_name, parent=self)
+
+    def __getattr__(self, name: str):
+        return getattr(self.duckdb_conn, name)
+
+
+def build_chart(duckdb_conn: duckdb.DuckDBPyConnection, chart: str) -> tuple[int, float]:
+    chart_class, chart_arguments = CHARTS[chart]
+    counting_conn = CountingConnection(duckdb_conn=duckdb_conn, table_name="file_benchmark_t")
+    get_result_cache().invalidate()
+    start_time = time.perf_counter()
+    chart_class(
+        duckdb_conn=counting_conn,
+        metric_column="Amount In Eur",
+        aggregation_method="sum",
+        table_name="file_benchmark_t",
+        **chart_arguments,
+    )
+    return counting_conn.table_statements, time.perf_counter() - start_time
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=2_000_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as benchmark_dir:
+        csv_file_path = f"{benchmark_dir}/benchmark.csv"
+        generate_csv(file_path=csv_file_path, number_rows=args.rows)
+        duckdb_conn = duckdb.connect(f"{benchmark_dir}/benchmark.db")
+        with mock.patch("own_your_data.components.import_file.get_duckdb_conn", return_value=duckdb_conn), mock.patch(
+            "own_your_data.utils.get_duckdb_conn", return_value=duckdb_conn
+        ):
+            initial_load()
+            run_import(data_source=[csv_file_path], file_name=csv_file_path, table_name="file_benchmark")
+            for chart_name in CHARTS:
+                chart_runs = [build_chart(duckdb_conn=duckdb_conn, chart=chart_name) for _ in range(3)]
+                print(
+                    {
+                        "chart": chart_name,
+                        "table statements": chart_runs[0][0],
+                        "build (ms)": round(statistics.median(chart_time for _, chart_time in chart_runs) * 1000, 1),
+                    }
+                )
+        duckdb_conn.close()
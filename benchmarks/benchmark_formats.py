@@ -0,0 +1,68 @@
+"""
+Benchmark the import speed per file format, run with `make benchmark`.
+
+The same generated data is written in every supported format and imported with `run_import`.
+"""
+
+import argparse
+import os
+import tempfile
+import time
+from unittest import mock
+
+import duckdb
+from pyarrow import feather
+
+from benchmarks.benchmark_import import generate_csv
+from own_your_data.components.import_file import get_table_name
+from own_your_data.components.import_file import run_import
+from own_your_data.utils import initial_load
+
+FILE_FORMATS = {
+    "benchmark.csv": None,
+    "benchmark.csv.gz": "(format csv)",
+    "benchmark.csv.zst": "(format csv)",
+    "benchmark.parquet": "(format parquet)",
+    "benchmark.ndjson": "(format json)",
+    "benchmark.arrow": "arrow",
+}
+
+
+def write_file_formats(file_dir: str, number_rows: int):
+    generate_csv(file_path=f"{file_dir}/benchmark.csv", number_rows=number_rows)
+    benchmark_data = duckdb.read_csv(f"{file_dir}/benchmark.csv")
+    for file_name, copy_options in FILE_FORMATS.items():
+        if copy_options == "arrow":
+            feather.write_feather(benchmark_data.df(), f"{file_dir}/{file_name}", compression="uncompressed")
+        elif copy_options:
+            duckdb.execute(f"copy (select * from benchmark_data) to '{file_dir}/{file_name}' {copy_options}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=5_000_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as benchmark_dir:
+        write_file_formats(file_dir=benchmark_dir, number_rows=args.rows)
+        duckdb_conn = duckdb.connect(f"{benchmark_dir}/benchmark.db")
+        with mock.patch("own_your_data.components.import_file.get_duckdb_conn", return_value=duckdb_conn), mock.patch(
+            "own_your_data.utils.get_duckdb_conn", return_value=duckdb_conn
+        ):
+            initial_load()
+            for benchmark_file_name in FILE_FORMATS:
+                start_time = time.perf_counter()
+                run_import(
+                    data_source=[f"{benchmark_dir}/{benchmark_file_name}"],
+                    file_name=benchmark_file_name,
+                    table_name=get_table_name(benchmark_file_name),
+                )
+                total_time = time.perf_counter() - start_time
+                print(
+                    {
+                        "format": benchmark_file_name,
+                        "file size (MiB)": round(os.path.getsize(f"{benchmark_dir}/{benchmark_file_name}") / 2**20),
+                        "rows/sec": round(args.rows / total_time),
+                        "seconds": round(total_time, 2),
+                    }
+                )
@@ -0,0 +1,95 @@
+"""
+Benchmark the import of a generated csv file, run with `make benchmark`.
+
+Every scenario runs in a separate process, so the peak memory (max RSS) is not shared between them.
+The `two pass` scenario reproduces the previous import, which first materialized the csv in a raw table
+and then copied it into the final table.
+"""
+
+import argparse
+import os
+import resource
+import tempfile
+import time
+from multiprocessing import Pool
+from unittest import mock
+
+import duckdb
+
+from own_your_data.components.import_file import import_uploaded_file
+from own_your_data.components.import_file import process_imported_data
+from own_your_data.utils import initial_load
+
+
+def generate_csv(file_path: str, number_rows: int):
+    duckdb.execute(
+        f"""
+        copy (select '2024-01-01'::timestamp + to_minutes(range) as register_date,
+            ['FOOD', 'BEVERAGE', 'ALCOHOL', 'SWEETS'][range % 4 + 1] as category,
+            ['LIDL', 'CARREFOUR', 'ALDI', 'WALMART'][range % 3 + 1] as store,
+            round(random() * 5, 2) as "amount in EuR",
+            'NLD' as "country iso code 3"
+          from range({number_rows})) to '{file_path}'
+        """
+    )
+
+
+def import_two_pass(duckdb_conn: duckdb.DuckDBPyConnection, file_path: str, table_name: str):
+    imported_data = duckdb_conn.read_csv(file_path)  # NOQA
+    duckdb_conn.execute(f"create table {table_name} as select * from imported_data")
+    column_selection = ",".join(f'"{column}"' for column in imported_data.columns)
+    duckdb_conn.execute(
+        f"""create table {table_name}_t as
+        select {column_selection},
+            monthname(register_date) as "Register Date Month Name Auto",
+            dayname(register_date) as "Register Date Day Name Auto",
+            date_part('year', register_date) as "Register Date Year Auto",
+            register_date::date as "Register Date Date Auto"
+        from {table_name}"""
+    )
+    duckdb_conn.execute(f"drop table {table_name}")
+
+
+def import_single_pass(duckdb_conn: duckdb.DuckDBPyConnection, file_path: str, table_name: str):
+    with mock.patch("own_your_data.components.import_file.get_duckdb_conn", return_value=duckdb_conn), mock.patch(
+        "own_your_data.utils.get_duckdb_conn", return_value=duckdb_conn
+    ):
+        initial_load()
+        imported_data = import_uploaded_file(data_source=[file_path], table_name=table_name, file_name=file_path)
+        process_imported_data(imported_data=imported_data, table_name=table_name)
+
+
+def run_scenario(scenario: str, file_path: str, number_rows: int) -> dict:
+    with tempfile.TemporaryDirectory() as database_dir:
+        duckdb_conn = duckdb.connect(f"{database_dir}/benchmark.db")
+        start_time = time.perf_counter()
+        BENCHMARK_SCENARIOS[scenario](duckdb_conn=duckdb_conn, file_path=file_path, table_name="file_benchmark")
+        duckdb_conn.execute("checkpoint")
+        total_time = time.perf_counter() - start_time
+        duckdb_conn.close()
+        return {
+            "scenario": scenario,
+            "rows/sec": round(number_rows / total_time),
+            "seconds": round(total_time, 2),
+            "peak RSS (MiB)": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024),
+            "database size (MiB)": round(os.path.getsize(f"{database_dir}/benchmark.db") / pow(1024, 2)),
+        }
+
+
+BENCHMARK_SCENARIOS = {
+    "two pass": import_two_pass,
+    "single pass": import_single_pass,
+}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as csv_dir:
+        csv_file_path = f"{csv_dir}/benchmark.csv"
+        generate_csv(file_path=csv_file_path, number_rows=args.rows)
+        for scenario_name in BENCHMARK_SCENARIOS:
+            with Pool(1) as pool:
+                print(pool.apply(run_scenario, (scenario_name, csv_file_path, args.rows)))
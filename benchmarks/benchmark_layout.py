@@ -0,0 +1,98 @@
+"""
+Benchmark the latency of filtered charts on a sorted table, run with `make benchmark`.
+
+The generated data is in random order, it is imported unsorted, sorted by its date column and sorted by
+its date and store columns. The chart queries of the same filtered charts are timed on every table.
+"""
+
+import argparse
+import statistics
+import tempfile
+import time
+from multiprocessing import Pool
+from unittest import mock
+
+import duckdb
+
+from own_your_data.charts.definition import BarChart
+from own_your_data.components.import_file import run_import
+from own_your_data.utils import initial_load
+
+SORT_SCENARIOS = {
+    "unsorted": {},
+    "sorted by date": {"sort_by_date": True},
+    "sorted by date and store": {"sort_by_date": True, "sort_column": "Store"},
+}
+
+FILTERED_CHARTS = {
+    "year": ("Register Date Year Auto", "2020"),
+    "day": ("Register Date Date Auto", "2020-06-01"),
+    "store": ("Store", "LIDL"),
+}
+
+
+def generate_parquet(file_path: str, number_rows: int):
+    duckdb.execute(
+        f"""
+        copy (select '2015-01-01'::timestamp + to_minutes((random() * 10 * 365 * 24 * 60)::bigint) as register_date,
+            ['FOOD', 'BEVERAGE', 'ALCOHOL', 'SWEETS'][range % 4 + 1] as category,
+            ['LIDL', 'CARREFOUR', 'ALDI', 'WALMART', 'JUMBO', 'SPAR'][(random() * 5)::int + 1] as store,
+            round(random() * 5, 2) as "amount in EuR",
+            'NLD' as "country iso code 3"
+          from range({number_rows})) to '{file_path}' (format parquet)
+        """
+    )
+
+
+def time_chart_query(duckdb_conn: duckdb.DuckDBPyConnection, filter_column: str, filter_value: str) -> float:
+    bar_chart = BarChart(
+        duckdb_conn=duckdb_conn,
+        metric_column="Amount In Eur",
+        dim_columns=["Category"],
+        color_column=None,
+        orientation="v",
+        aggregation_method="sum",
+        table_name="file_benchmark_t",
+        filter_column=filter_column,
+        filter_value=filter_value,
+    )
+    query_times = []
+    for _ in range(5):
+        start_time = time.perf_counter()
+        duckdb_conn.execute(bar_chart.sql_query).fetchall()
+        query_times.append(time.perf_counter() - start_time)
+    return statistics.median(query_times) * 1000
+
+
+def run_scenario(scenario: str, file_path: str, database_dir: str) -> dict:
+    duckdb_conn = duckdb.connect(f"{database_dir}/{scenario.replace(' ', '_')}.db")
+    with mock.patch("own_your_data.components.import_file.get_duckdb_conn", return_value=duckdb_conn), mock.patch(
+        "own_your_data.utils.get_duckdb_conn", return_value=duckdb_conn
+    ):
+        initial_load()
+        start_time = time.perf_counter()
+        run_import(
+            data_source=[file_path], file_name=file_path, table_name="file_benchmark", **SORT_SCENARIOS[scenario]
+        )
+        duckdb_conn.execute("checkpoint")
+        import_time = time.perf_counter() - start_time
+        chart_times = {
+            f"{chart} filter (ms)": round(time_chart_query(duckdb_conn, *filtered_chart), 1)
+            for chart, filtered_chart in FILTERED_CHARTS.items()
+        }
+    duckdb_conn.close()
+    return {"scenario": scenario, "import (s)": round(import_time, 1), **chart_times}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=50_000_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as benchmark_dir:
+        parquet_file_path = f"{benchmark_dir}/benchmark.parquet"
+        generate_parquet(file_path=parquet_file_path, number_rows=args.rows)
+        for scenario_name in SORT_SCENARIOS:
+            # a separate process per scenario, the initial load is cached per process
+            with Pool(1) as pool:
+                print(pool.apply(run_scenario, (scenario_name, parquet_file_path, benchmark_dir)))
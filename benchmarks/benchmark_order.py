@@ -0,0 +1,56 @@
+"""
+Benchmark the ordering of the chart values, run with `make benchmark`.
+
+The generated table has a day name, a text, an integer and a date column. Every column is ordered by its value
+and by the sort key of the charts, the difference between the two is the cost of the day and month sort keys.
+"""
+
+import argparse
+import statistics
+import time
+
+import duckdb
+
+from own_your_data.charts.helpers import get_order_clause
+
+ORDERED_COLUMNS = ["day name", "store", "amount", "register date"]
+
+
+def generate_table(duckdb_conn: duckdb.DuckDBPyConnection, number_rows: int):
+    duckdb_conn.execute(
+        f"""
+        create table order_benchmark as
+        select dayname('2024-01-01'::date + (range % 7)::int) as "day name",
+            ['LIDL', 'CARREFOUR', 'ALDI', 'WALMART'][range % 4 + 1] as store,
+            hash(range) % 1000 as amount,
+            '2024-01-01'::date + (hash(range, 1) % 1000)::int as "register date"
+        from range({number_rows})
+        """
+    )
+
+
+def time_order(duckdb_conn: duckdb.DuckDBPyConnection, order_clause: str) -> float:
+    query_times = []
+    for _ in range(3):
+        start_time = time.perf_counter()
+        duckdb_conn.execute(f"select * from order_benchmark order by {order_clause} limit 10").fetchall()
+        query_times.append(time.perf_counter() - start_time)
+    return round(statistics.median(query_times) * 1000, 1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=20_000_000)
+    args = parser.parse_args()
+
+    duckdb_conn = duckdb.connect()
+    generate_table(duckdb_conn=duckdb_conn, number_rows=args.rows)
+    for column in ORDERED_COLUMNS:
+        print(
+            {
+                "column": column,
+                "order by value (ms)": time_order(duckdb_conn=duckdb_conn, order_clause=f'"{column}"'),
+                "order by sort key (ms)": time_order(duckdb_conn=duckdb_conn, order_clause=get_order_clause(column)),
+            }
+        )
+    duckdb_conn.close()
@@ -0,0 +1,82 @@
+"""
+Benchmark the results of a query as a pandas data frame and as an arrow table, run with `make benchmark`.
+
+A result of 1M rows is fetched from duckdb both ways, in a separate process each. The time to fetch it, its size
+in the result cache, the peak memory of the first fetch and the time to serialize it for st.dataframe are compared,
+next to the time to convert the arrow table to the data frame plotly draws.
+"""
+
+import argparse
+import resource
+import statistics
+import time
+from multiprocessing import Pool
+
+import duckdb
+from streamlit import dataframe_util
+
+from own_your_data.utils import arrow_to_pandas
+from own_your_data.utils import execute_arrow
+
+RESULT_SCENARIOS = ["data frame", "arrow table"]
+
+
+def time_call(func, *args) -> tuple:
+    call_times = []
+    for _ in range(3):
+        start_time = time.perf_counter()
+        result = func(*args)
+        call_times.append(time.perf_counter() - start_time)
+    return result, round(statistics.median(call_times) * 1000, 1)
+
+
+def fetch_data_frame(duckdb_conn: duckdb.DuckDBPyConnection, sql_query: str):
+    return duckdb_conn.execute(sql_query).df()
+
+
+def run_scenario(scenario: str, number_rows: int) -> dict:
+    duckdb_conn = duckdb.connect()
+    duckdb_conn.execute(
+        f"""
+        create table result_benchmark as
+        select range as id,
+            '2024-01-01'::timestamp + to_minutes(range) as register_date,
+            ['FOOD', 'BEVERAGE', 'ALCOHOL', 'SWEETS'][range % 4 + 1] as category,
+            'store ' || (range % 100) as store,
+            round(random() * 5, 2)::decimal(10, 2) as amount
+        from range({number_rows})
+        """
+    )
+    sql_query = "from result_benchmark"
+    fetch_result = execute_arrow if scenario == "arrow table" else fetch_data_frame
+    start_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    fetch_result(duckdb_conn, sql_query)
+    peak_rss_increase = round((resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - start_rss) / 1024)
+    if scenario == "arrow table":
+        result, fetch_time = time_call(execute_arrow, duckdb_conn, sql_query)
+        result_size = result.nbytes
+        _, pandas_time = time_call(arrow_to_pandas, result)
+    else:
+        result, fetch_time = time_call(fetch_data_frame, duckdb_conn, sql_query)
+        result_size = int(result.memory_usage(deep=True).sum())
+        pandas_time = None
+    _, serialize_time = time_call(dataframe_util.convert_anything_to_arrow_bytes, result)
+    duckdb_conn.close()
+    return {
+        "result": scenario,
+        "fetch (ms)": fetch_time,
+        "result size (MiB)": round(result_size / pow(1024, 2)),
+        "peak RSS increase (MiB)": peak_rss_increase,
+        "st.dataframe serialization (ms)": serialize_time,
+        "to plotly data frame (ms)": pandas_time,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    for scenario_name in RESULT_SCENARIOS:
+        with Pool(1) as pool:
+            print(pool.apply(run_scenario, (scenario_name, args.rows)))
@@ -0,0 +1,72 @@
+"""
+Benchmark the query of a sankey chart, run with `make benchmark`.
+
+The generated table has 5 flow columns with the same number of distinct values, from 10 to 10k labels per column.
+The sankey chart of the 5 columns is built with an empty result cache, its nodes and links are counted.
+"""
+
+import argparse
+import statistics
+import time
+from unittest import mock
+
+import duckdb
+
+from own_your_data.charts.definition import SankeyChart
+from own_your_data.utils import get_result_cache
+from own_your_data.utils import initial_load
+
+FLOW_COLUMNS = ["flow 1", "flow 2", "flow 3", "flow 4", "flow 5"]
+LABEL_COUNTS = [10, 100, 1_000, 10_000]
+
+
+def generate_table(duckdb_conn: duckdb.DuckDBPyConnection, number_rows: int, number_labels: int):
+    flow_columns = ", ".join(
+        f"""'label ' || (hash(range, {idx}) % {number_labels}) as "{flow_column}\""""
+        for idx, flow_column in enumerate(FLOW_COLUMNS)
+    )
+    duckdb_conn.execute(
+        f"""
+        create or replace table sankey_benchmark_t as
+        select {flow_columns}, (hash(range) % 500) / 100 as amount
+        from range({number_rows})
+        """
+    )
+
+
+def build_chart(duckdb_conn: duckdb.DuckDBPyConnection) -> tuple[SankeyChart, float]:
+    get_result_cache().invalidate()
+    start_time = time.perf_counter()
+    sankey_chart = SankeyChart(
+        duckdb_conn=duckdb_conn,
+        metric_column="amount",
+        dim_columns=FLOW_COLUMNS,
+        color_column=None,
+        orientation=None,
+        aggregation_method="sum",
+        table_name="sankey_benchmark_t",
+    )
+    return sankey_chart, time.perf_counter() - start_time
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    duckdb_conn = duckdb.connect()
+    with mock.patch("own_your_data.utils.get_duckdb_conn", return_value=duckdb_conn):
+        initial_load()
+        for label_count in LABEL_COUNTS:
+            generate_table(duckdb_conn=duckdb_conn, number_rows=args.rows, number_labels=label_count)
+            chart_runs = [build_chart(duckdb_conn=duckdb_conn) for _ in range(3)]
+            sankey_data = chart_runs[0][0].data.to_dict(orient="records")[0]
+            print(
+                {
+                    "labels per column": label_count,
+                    "nodes": len(sankey_data["label"]),
+                    "links": len(sankey_data["source"]),
+                    "build (ms)": round(statistics.median(chart_time for _, chart_time in chart_runs) * 1000, 1),
+                }
+            )
+    duckdb_conn.close()
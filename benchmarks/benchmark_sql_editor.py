@@ -0,0 +1,76 @@
+"""
+Benchmark the result of a select statement in the sql editor, run with `make benchmark`.
+
+The statement reads a table of 10M rows, its whole result is fetched at once and it is stored in duckdb with a page
+fetched at a time, in a separate process each. The time until the first page is shown, the time to fetch the last
+page, the peak memory and the bytes serialized for st.dataframe are compared.
+"""
+
+import argparse
+import resource
+import time
+import uuid
+from multiprocessing import Pool
+
+import duckdb
+from streamlit import dataframe_util
+
+from own_your_data.components.sql_editor import get_query_result_page
+from own_your_data.components.sql_editor import get_result_table_name
+from own_your_data.components.sql_editor import store_query_result
+from own_your_data.utils import execute_arrow
+
+SQL_EDITOR_SCENARIOS = ["whole result", "paged result"]
+
+
+def run_scenario(scenario: str, number_rows: int) -> dict:
+    duckdb_conn = duckdb.connect()
+    duckdb_conn.execute(
+        f"""
+        create table sql_editor_benchmark as
+        select range as id,
+            '2024-01-01'::timestamp + to_minutes(range) as register_date,
+            ['FOOD', 'BEVERAGE', 'ALCOHOL', 'SWEETS'][range % 4 + 1] as category,
+            'store ' || (range % 100) as store,
+            round(random() * 5, 2)::decimal(10, 2) as amount
+        from range({number_rows})
+        """
+    )
+    sql_query = "select * from sql_editor_benchmark where amount > 1"
+    start_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start_time = time.perf_counter()
+    last_page_time = None
+    if scenario == "paged result":
+        result_table_name = get_result_table_name(session_id=uuid.uuid4(), statement_index=1)
+        row_count = store_query_result(
+            duckdb_conn=duckdb_conn, sql_query=sql_query, result_table_name=result_table_name
+        )
+        result = get_query_result_page(duckdb_conn=duckdb_conn, result_table_name=result_table_name, page=1)
+        result_bytes = dataframe_util.convert_anything_to_arrow_bytes(result)
+        first_page_time = time.perf_counter() - start_time
+        start_time = time.perf_counter()
+        get_query_result_page(duckdb_conn=duckdb_conn, result_table_name=result_table_name, page=row_count // 1000)
+        last_page_time = round((time.perf_counter() - start_time) * 1000, 1)
+    else:
+        result = execute_arrow(duckdb_conn=duckdb_conn, sql_query=sql_query)
+        result_bytes = dataframe_util.convert_anything_to_arrow_bytes(result)
+        first_page_time = time.perf_counter() - start_time
+    peak_rss_increase = round((resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - start_rss) / 1024)
+    duckdb_conn.close()
+    return {
+        "result": scenario,
+        "first page (ms)": round(first_page_time * 1000, 1),
+        "last page (ms)": last_page_time,
+        "peak RSS increase (MiB)": peak_rss_increase,
+        "st.dataframe bytes (MiB)": round(len(result_bytes) / pow(1024, 2), 2),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    args = parser.parse_args()
+
+    for scenario_name in SQL_EDITOR_SCENARIOS:
+        with Pool(1) as pool:
+            print(pool.apply(run_scenario, (scenario_name, args.rows)))
@@ -0,0 +1,91 @@
+"""
+Benchmark the narrowing of the column types at import, run with `make benchmark`.
+
+The generated csv file is imported with and without narrowing the column types, in a separate process each,
+after which the database size, the memory used by duckdb and the latency of a grouped chart query are compared.
+"""
+
+import argparse
+import os
+import resource
+import statistics
+import tempfile
+import time
+from multiprocessing import Pool
+from unittest import mock
+
+import duckdb
+
+from benchmarks.benchmark_import import generate_csv
+from own_your_data.charts.definition import BarChart
+from own_your_data.components.import_file import run_import
+from own_your_data.utils import initial_load
+
+
+def time_query(duckdb_conn: duckdb.DuckDBPyConnection, sql_query: str) -> float:
+    query_times = []
+    for _ in range(3):
+        start_time = time.perf_counter()
+        duckdb_conn.execute(sql_query).fetchall()
+        query_times.append(time.perf_counter() - start_time)
+    return round(statistics.median(query_times) * 1000, 1)
+
+
+def get_chart_query(duckdb_conn: duckdb.DuckDBPyConnection) -> str:
+    return BarChart(
+        duckdb_conn=duckdb_conn,
+        metric_column="Amount In Eur",
+        dim_columns=["Store"],
+        color_column="Category",
+        orientation="v",
+        aggregation_method="sum",
+        table_name="file_benchmark_t",
+    ).sql_query
+
+
+def run_scenario(narrow_types: bool, file_path: str) -> dict:
+    with tempfile.TemporaryDirectory() as database_dir:
+        duckdb_conn = duckdb.connect(f"{database_dir}/benchmark.db")
+        with mock.patch("own_your_data.components.import_file.get_duckdb_conn", return_value=duckdb_conn), mock.patch(
+            "own_your_data.utils.get_duckdb_conn", return_value=duckdb_conn
+        ):
+            initial_load()
+            start_time = time.perf_counter()
+            run_import(
+                data_source=[file_path], file_name=file_path, table_name="file_benchmark", narrow_types=narrow_types
+            )
+            duckdb_conn.execute("checkpoint")
+            import_time = time.perf_counter() - start_time
+            group_by_time = time_query(
+                duckdb_conn=duckdb_conn,
+                sql_query='select "Store", "Category", sum("Amount In Eur") from file_benchmark_t group by all',
+            )
+            chart_time = time_query(duckdb_conn=duckdb_conn, sql_query=get_chart_query(duckdb_conn=duckdb_conn))
+            used_size = duckdb_conn.execute(
+                "select used_blocks * block_size from pragma_database_size() where database_name = 'benchmark'"
+            ).fetchone()[0]
+            memory_usage = duckdb_conn.execute("select sum(memory_usage_bytes) from duckdb_memory()").fetchone()[0]
+        duckdb_conn.close()
+        return {
+            "narrow types": narrow_types,
+            "import (s)": round(import_time, 1),
+            "database size (MiB)": round(os.path.getsize(f"{database_dir}/benchmark.db") / pow(1024, 2)),
+            "used blocks (MiB)": round(used_size / pow(1024, 2)),
+            "duckdb memory (MiB)": round(memory_usage / pow(1024, 2)),
+            "peak RSS (MiB)": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024),
+            "group by (ms)": group_by_time,
+            "chart query (ms)": chart_time,
+        }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as csv_dir:
+        csv_file_path = f"{csv_dir}/benchmark.csv"
+        generate_csv(file_path=csv_file_path, number_rows=args.rows)
+        for narrow_types in (False, True):
+            with Pool(1) as pool:
+                print(pool.apply(run_scenario, (narrow_types, csv_file_path)))
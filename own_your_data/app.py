@@ -1,23 +1,28 @@
+import shutil
+import tempfile
 import uuid
 from pathlib import Path
 
 import streamlit as st
 
-from own_your_data.components.chart_configuration import get_cached_plot
 from own_your_data.components.chart_configuration import get_chart_configuration
 from own_your_data.components.chart_configuration import get_chart_layout
 from own_your_data.components.chart_configuration import get_charts_components
 from own_your_data.components.data_analysis import get_data_analysis_components
-from own_your_data.components.import_file import cleanup_db
+from own_your_data.components.import_file import IMPORT_FILE_TYPES
+from own_your_data.components.import_file import get_import_dir
+from own_your_data.components.import_file import get_path_data_source
+from own_your_data.components.import_file import get_path_table_name
 from own_your_data.components.import_file import get_table_name
-from own_your_data.components.import_file import get_unzipped_data
 from own_your_data.components.import_file import import_demo_file
-from own_your_data.components.import_file import import_uploaded_file
-from own_your_data.components.import_file import process_imported_data
+from own_your_data.components.import_file import spill_uploaded_file
+from own_your_data.components.import_jobs import ImportJob
+from own_your_data.components.import_jobs import get_import_jobs_components
+from own_your_data.components.import_jobs import get_session_import_jobs
+from own_your_data.components.import_jobs import submit_import_job
 from own_your_data.components.sql_editor import display_duckdb_catalog
 from own_your_data.components.sql_editor import get_code_editor
 from own_your_data.components.system_info import get_system_info
-from own_your_data.utils import cache_duckdb_execution
 from own_your_data.utils import get_duckdb_conn
 from own_your_data.utils import get_tables
 from own_your_data.utils import initial_load
@@ -54,7 +59,7 @@ if "table_options" not in st.session_state:
 if "sql_code" not in st.session_state:
     st.session_state.sql_code = None
 
-about_col, import_data_col, _, _ = st.columns([1, 1, 1, 1], gap="small", vertical_alignment="center")
+about_col, import_data_col, import_jobs_col, _ = st.columns([1, 1, 1, 1], gap="small", vertical_alignment="center")
 
 with about_col.popover("How To", use_container_width=True, icon="ℹ️"):
     # pre-commit is removing trailing whitespace, which is not desired in this text
@@ -69,47 +74,125 @@ with about_col.popover("How To", use_container_width=True, icon="ℹ️"):
 
 with import_data_col.popover("Import Data", use_container_width=True, icon="⬆️"):
     with st.form("import data", clear_on_submit=True):
-        st.warning("Uploading a file with the same name will result into overwriting the data.")
+        st.warning("Uploading a file with the same name will result into overwriting the data, unless appended.")
         data_source = st.file_uploader(
             "Choose a file",
-            type=["csv", "txt", "zip", "tsv"],
+            type=[*IMPORT_FILE_TYPES, "zip"],
             help="""
             Upload a file in csv or txt format in which you have data you would like to explore. \n
-            You can also upload a zip of csv/txt files, they should contain similar data as they will be
+            Parquet, json (also newline delimited) and arrow files are read natively,
+            csv files compressed as gz or zst are read without unpacking them first. \n
+            You can also upload a zip of such files, they should contain similar data as they will be
             imported in the same table. \n
             A demo file is available at
              [github](https://github.com/acirtep/own-your-data/blob/main/own_your_data/demo/demo_file.txt)
         """,
         )
+        data_path = st.text_input(
+            "Or import from a path/URL",
+            placeholder="/data/exports/*.csv",
+            help="""
+            A local path, a glob or an [fsspec](https://filesystem-spec.readthedocs.io) url of the files to import.
+            The files are read in place, without uploading them through the browser.
+            """,
+        )
         add_auto_columns = st.checkbox("Automatically parse date fields into year, month name and day name", value=True)
-        submitted = st.form_submit_button("Upload file")
-
-    if submitted and data_source:
-        table_name = get_table_name(data_source.name)
-        final_table_name = f"{table_name}_t"
+        virtual_auto_columns = st.checkbox(
+            "Compute the parsed date fields when reading the table",
+            help="""
+            The parsed date fields are not stored, but computed by a view over the imported data,
+            which keeps the table small and the import fast when it has many date fields
+            """,
+        )
+        narrow_types = st.checkbox(
+            "Store the columns in the smallest type which holds their values",
+            help="""
+            Text columns with few distinct values are stored as an enum, whole and decimal numbers as the smallest
+            integer or decimal type, the table takes less space and is grouped by faster.
+            An insert from the SQL Editor of a value outside such an enum fails, an appended file widens the column.
+            """,
+        )
+        sort_by_date = st.checkbox(
+            "Sort the table by its date column",
+            help="""
+            The rows are stored in the order of the first date or timestamp column,
+            charts filtered on a date, or on the year, of this column skip the parts of the table outside of it
+            """,
+        )
+        sort_column = st.text_input(
+            "Sort the table by column",
+            help="Stores the rows in the order of this column too, charts filtered on it read less data",
+        )
+        store_rejects = st.checkbox(
+            "Skip the rows which cannot be read",
+            help="""
+            Instead of failing the import, csv rows with a wrong number of columns or values of a wrong type
+            are skipped and stored in a rejects table, with their line number.
+            The files of such an import need the same columns.
+            """,
+        )
+        import_mode = st.radio(
+            "Import mode",
+            ("overwrite", "append"),
+            horizontal=True,
+            help="Overwrite recreates the table, append adds the rows to an existing table with the same columns",
+        )
+        append_table_name = st.selectbox(
+            "Append to table",
+            [table for table in st.session_state.table_options if table.startswith("file_")],
+            index=None,
+            help="Only used when appending, by default the table with the same name as the file is used",
+        )
+        deduplicate_column = st.text_input(
+            "Deduplicate on column",
+            help="Only used when appending, rows of which the value in this column already exists are skipped",
+        )
+        submitted = st.form_submit_button("Import data")
+
+    if submitted and (data_source or data_path):
+        file_name = data_source.name if data_source else data_path
+        table_name = get_table_name(data_source.name) if data_source else get_path_table_name(data_path)
+        if import_mode == "append" and append_table_name:
+            table_name = append_table_name.removesuffix("_t")
+        # the upload is spilled before the script run ends, the import itself runs in the background
+        import_dir = tempfile.mkdtemp(dir=get_import_dir())
         try:
-            cleanup_db(table_name=final_table_name)
-            if data_source.type == "application/zip":
-                import_uploaded_file(
-                    data_source=get_unzipped_data(data_source=data_source),
-                    table_name=table_name,
-                    file_name=data_source.name,
-                )
+            content_hash = None
+            if data_source:
+                file_paths = [
+                    spill_uploaded_file(data_source=data_source, file_name=data_source.name, import_dir=import_dir)
+                ]
             else:
-                import_uploaded_file(
-                    data_source=[data_source],
+                file_paths, content_hash = get_path_data_source(path=data_path)
+            submit_import_job(
+                ImportJob(
+                    session_id=st.session_state.session_id,
+                    data_source=file_paths,
+                    file_name=file_name,
                     table_name=table_name,
-                    file_name=data_source.name,
+                    content_hash=content_hash,
+                    import_dir=import_dir,
+                    import_mode=import_mode,
+                    add_auto_columns=add_auto_columns,
+                    deduplicate_column=deduplicate_column or None,
+                    sort_by_date=sort_by_date,
+                    sort_column=sort_column or None,
+                    narrow_types=narrow_types,
+                    virtual_auto_columns=virtual_auto_columns,
+                    store_rejects=store_rejects,
                 )
-            process_imported_data(table_name=table_name, add_auto_columns=add_auto_columns)
-            st.success(f"File {data_source.name} successfully imported into {final_table_name} table")
-            st.session_state.table_options = get_tables()
-            st.session_state.index_option = st.session_state.table_options.index(final_table_name)
-            get_cached_plot.clear()
-            cache_duckdb_execution.clear()
+            )
         except Exception as error:  # NOQA everything can go wrong
+            shutil.rmtree(import_dir, ignore_errors=True)
             st.error(f"Something went wrong: {error}")
 
+with import_jobs_col:
+    if get_session_import_jobs(session_id=st.session_state.session_id):
+        get_import_jobs_components()
+    if "import_message" in st.session_state:
+        message_type, message = st.session_state.pop("import_message")
+        getattr(st, message_type)(message)
+
 # with export_data_col.popover("Export from database"):
 #     st.info("In order to export specific tables, go to `SQL Editor`, do a `select * from` and download the result.\
 #             The functionality to export a selection of tables is under development.")
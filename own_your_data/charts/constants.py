@@ -27,5 +27,73 @@ class SupportedAggregationMethods(str, ExtendedEnum):
     none = "none"
 
 
+class SupportedTimeGranularities(str, ExtendedEnum):
+    auto = "auto"
+    none = "none"
+    hour = "hour"
+    day = "day"
+    week = "week"
+    month = "month"
+    quarter = "quarter"
+    year = "year"
+
+
+# auto picks the smallest time granularity which splits the range of the x-axis in at most TIME_BUCKETS_MAX buckets
+TIME_BUCKETS_MAX = 500
+TIME_GRANULARITY_SECONDS = {
+    SupportedTimeGranularities.hour: 60 * 60,
+    SupportedTimeGranularities.day: 24 * 60 * 60,
+    SupportedTimeGranularities.week: 7 * 24 * 60 * 60,
+    SupportedTimeGranularities.month: 30.44 * 24 * 60 * 60,
+    SupportedTimeGranularities.quarter: 91.31 * 24 * 60 * 60,
+    SupportedTimeGranularities.year: 365.25 * 24 * 60 * 60,
+}
+
+# a scatter chart draws a sample of at most SCATTER_CHART_MAX_POINTS points, with the density heatmap enabled
+# the points of a chart with more than SCATTER_CHART_DENSITY_THRESHOLD points are counted in bins instead
+SCATTER_CHART_MAX_POINTS = 50_000
+SCATTER_CHART_DENSITY_THRESHOLD = 200_000
+SCATTER_CHART_DENSITY_BINS = 100
+
+# the values of a dimension which are not in the top n of a chart are grouped under this value
+TOP_N_OTHER_VALUE = "Other"
+
 PRIMARY_COLOR = "rgb(237, 173, 8)"
 SECONDARY_COLOR = "rgb(255, 242, 174)"
+
+# a line chart is drawn with at most 4 points per series in each of its buckets, about one bucket per pixel
+LINE_CHART_BUCKETS = 1000
+
+# the day and month names are ordered by their position in the week and the year, before the other text values
+DAY_MONTH_SORT_KEYS = {
+    name: str(100 + position)
+    for position, name in enumerate(
+        [
+            "Monday",
+            "Tuesday",
+            "Wednesday",
+            "Thursday",
+            "Friday",
+            "Saturday",
+            "Sunday",
+            "January",
+            "February",
+            "March",
+            "April",
+            "May",
+            "June",
+            "July",
+            "August",
+            "September",
+            "October",
+            "November",
+            "December",
+        ]
+    )
+}
+
+# a heatmap shows the first HEATMAP_AXIS_MAX values of each axis, in the order of the values
+HEATMAP_AXIS_MAX = 500
+
+# a column of a sankey chart shows at most SANKEY_COLUMN_VALUES_MAX values, the other values are grouped as Other
+SANKEY_COLUMN_VALUES_MAX = 100
@@ -2,21 +2,37 @@ from dataclasses import dataclass
 from itertools import chain
 from typing import Optional
 
+import numpy as np
 import plotly.express as px
 import plotly.graph_objects as go
 from duckdb import DuckDBPyConnection
+from pandas.api.types import is_numeric_dtype
 from plotly.graph_objs import Figure
 
+from own_your_data.charts.constants import HEATMAP_AXIS_MAX
+from own_your_data.charts.constants import LINE_CHART_BUCKETS
 from own_your_data.charts.constants import PRIMARY_COLOR
+from own_your_data.charts.constants import SANKEY_COLUMN_VALUES_MAX
+from own_your_data.charts.constants import SCATTER_CHART_DENSITY_BINS
+from own_your_data.charts.constants import SCATTER_CHART_DENSITY_THRESHOLD
+from own_your_data.charts.constants import SCATTER_CHART_MAX_POINTS
 from own_your_data.charts.constants import SECONDARY_COLOR
+from own_your_data.charts.constants import TIME_BUCKETS_MAX
+from own_your_data.charts.constants import TIME_GRANULARITY_SECONDS
+from own_your_data.charts.constants import TOP_N_OTHER_VALUE
 from own_your_data.charts.constants import SupportedAggregationMethods
 from own_your_data.charts.constants import SupportedPlots
+from own_your_data.charts.constants import SupportedTimeGranularities
 from own_your_data.charts.helpers import get_order_clause
+from own_your_data.utils import arrow_to_pandas
 from own_your_data.utils import cache_duckdb_execution
+from own_your_data.utils import get_table_schema
 from own_your_data.utils import timeit
 
 
 class BaseChart:
+    supports_time_granularity = False
+    supports_top_n = False
 
     def __init__(
         self,
@@ -30,6 +46,8 @@ class BaseChart:
         color_scheme: list[str] | None = None,
         filter_column: str | None = None,
         filter_value: str | None = None,
+        time_granularity: str = SupportedTimeGranularities.none.value,
+        top_n: int | None = None,
     ):
         self.duckdb_conn = duckdb_conn
         self.metric_column = metric_column
@@ -56,13 +74,20 @@ class BaseChart:
             cleaned_filter_value = filter_value.replace("'", "''")
             self.where_expression = f" {self.where_expression} and \"{self.filter_column}\" = '{cleaned_filter_value}'"
         self.group_by = "" if self.aggregation_method == SupportedAggregationMethods.none else "group by all"
-        self.validate_color_scheme()
-        self.x_integer = self.check_is_integer(column_name=self.dim_columns[0])
+        self.time_granularity = self.get_time_granularity(time_granularity=time_granularity)
+        self.top_n = None if self.aggregation_method == SupportedAggregationMethods.none else top_n
+        self.from_expression = self.get_from_expression()
+        # the values of a top n dimension are text, they are drawn as categories like the integers
+        self.x_integer = self.check_is_integer(column_name=self.dim_columns[0]) or (
+            self.dim_columns[0] in self.get_top_n_columns()
+        )
         self.y_integer = False
         if len(self.dim_columns) == 2:
             self.y_integer = self.check_is_integer(column_name=self.dim_columns[1])
+        # the table is scanned once, by the query of the chart, the rest is derived from its result
         self.sql_query = self.get_sql_query()
         self.data = self.get_data()
+        self.validate_color_scheme()
         self.category_orders = self.get_category_orders()
         self.plot = self.get_plot()
 
@@ -74,7 +99,7 @@ class BaseChart:
                 {self.agg_expression} as "{self.metric_column}",
                 "{self.dim_columns[0]}",
                 {get_order_clause(self.dim_columns[0])} as "ordered xyz"
-            from {self.table_name}
+            from {self.from_expression}
             {self.where_expression}
             {self.group_by}
             order by {get_order_clause(self.dim_columns[0])}
@@ -86,49 +111,132 @@ class BaseChart:
                 "{self.color_column}",
                 {get_order_clause(self.dim_columns[0])},
                 {get_order_clause(self.color_column)}
-            from {self.table_name}
+            from {self.from_expression}
             {self.where_expression}
             {self.group_by}
             order by {get_order_clause(self.dim_columns[0])},
                 {get_order_clause(self.color_column)}
         """
 
+    def get_top_n_columns(self) -> list[str]:
+        # the dimension of a bar or pie chart and the color column, unless they are filtered on or time bucketed
+        top_n_columns = [self.dim_columns[0]] if self.supports_top_n and not self.time_granularity else []
+        return [
+            column
+            for column in [*top_n_columns, self.color_column]
+            if self.top_n and column and column != self.filter_column
+        ]
+
+    @timeit
+    def get_from_expression(self) -> str:
+        # the table read by the chart, with the x-axis truncated to the time granularity,
+        # and the values which are not in the top n by the calculation grouped as Other
+        replace_expressions = []
+        if self.time_granularity:
+            table_schema = get_table_schema(table_name=self.table_name, duckdb_conn=self.duckdb_conn)
+            replace_expressions.append(
+                f"""date_trunc('{self.time_granularity}', "{self.dim_columns[0]}")
+                    ::{table_schema.columns[self.dim_columns[0]].data_type} as "{self.dim_columns[0]}"
+                """
+            )
+        for column in self.get_top_n_columns():
+            replace_expressions.append(
+                f"""case
+                    when "{column}" is null then null
+                    when "{column}" in (
+                        select "{column}"
+                        from {self.table_name}
+                        {self.where_expression}
+                        group by all
+                        order by {self.agg_expression} desc, "{column}"
+                        limit {self.top_n}
+                    ) then "{column}"::varchar
+                    else '{TOP_N_OTHER_VALUE}'
+                end as "{column}"
+                """
+            )
+        if not replace_expressions:
+            return self.table_name
+        return f"""(
+            select * replace ({", ".join(replace_expressions)})
+            from {self.table_name}
+        ) src"""
+
+    @timeit
+    def get_time_granularity(self, time_granularity: str) -> str | None:
+        # the date or timestamp x-axis of an aggregated chart is truncated to the time granularity,
+        # auto picks it from the range of the column, the chart has at most TIME_BUCKETS_MAX points per series
+        if (
+            not self.supports_time_granularity
+            or time_granularity == SupportedTimeGranularities.none
+            or self.aggregation_method == SupportedAggregationMethods.none
+            or self.filter_column == self.dim_columns[0]
+        ):
+            return None
+        table_schema = get_table_schema(table_name=self.table_name, duckdb_conn=self.duckdb_conn)
+        column_schema = table_schema.columns.get(self.dim_columns[0]) if table_schema else None
+        if not column_schema or not column_schema.is_date:
+            return None
+        if time_granularity != SupportedTimeGranularities.auto:
+            return time_granularity
+
+        range_seconds = cache_duckdb_execution(
+            duckdb_conn=self.duckdb_conn,
+            sql_query=f"""
+                select epoch(max("{self.dim_columns[0]}")) - epoch(min("{self.dim_columns[0]}")) as range_seconds
+                from {self.table_name}
+            """,
+        )["range_seconds"][0].as_py()
+        granularity = next(
+            (
+                granularity
+                for granularity, granularity_seconds in TIME_GRANULARITY_SECONDS.items()
+                if (range_seconds or 0) / granularity_seconds <= TIME_BUCKETS_MAX
+            ),
+            SupportedTimeGranularities.year,
+        )
+        if column_schema.data_type == "DATE" and granularity == SupportedTimeGranularities.hour:
+            granularity = SupportedTimeGranularities.day
+        return granularity.value
+
     @timeit
     def get_data(self):
-        return cache_duckdb_execution(_duckdb_conn=self.duckdb_conn, sql_query=self.sql_query)
+        return arrow_to_pandas(cache_duckdb_execution(duckdb_conn=self.duckdb_conn, sql_query=self.sql_query))
 
     @timeit
     def get_category_orders(self):
+        chart_data = self.duckdb_conn.from_df(self.data)
         category_order = {}
         for column in chain(self.dim_columns, [self.color_column]):
-            if not column:
+            if not column or column not in self.data.columns:
                 continue
-            unique_values_df = cache_duckdb_execution(
-                _duckdb_conn=self.duckdb_conn,
-                sql_query=f"""
-                        select distinct "{column}"
-                        from {self.table_name} src
-                        where try_cast("{column}" as numeric) is null
-                        and try_cast("{column}" as date) is null
-                        order by {get_order_clause(column)}
-                    """,
+            # the numbers and dates are ordered by plotly, unless they are grouped in a top n
+            value_filter = (
+                ""
+                if column in self.get_top_n_columns()
+                else f"""where try_cast("{column}" as numeric) is null and try_cast("{column}" as date) is null"""
             )
-            if not unique_values_df.empty:
-                category_order[column] = unique_values_df[column].tolist()
+            unique_values = chart_data.query(
+                "chart_data",
+                f"""
+                    select distinct "{column}"
+                    from chart_data src
+                    {value_filter}
+                    order by {get_order_clause(column)}
+                """,
+            ).fetchall()
+            if unique_values:
+                category_order[column] = sorted(
+                    [unique_value[0] for unique_value in unique_values],
+                    key=lambda value: column in self.get_top_n_columns() and value == TOP_N_OTHER_VALUE,
+                )
         return category_order
 
     @timeit
     def check_is_integer(self, column_name):
-        is_integer = cache_duckdb_execution(
-            _duckdb_conn=self.duckdb_conn,
-            sql_query=f"""select 1
-                        from duckdb_columns
-                        where table_name='{self.table_name} '
-                        and column_name = '{column_name}'
-                        and (data_type = 'INTEGER' or data_type like '%INT')
-                    """,
-        )
-        return not is_integer.empty
+        table_schema = get_table_schema(table_name=self.table_name, duckdb_conn=self.duckdb_conn)
+        column_schema = table_schema.columns.get(column_name) if table_schema else None
+        return bool(column_schema and column_schema.is_integer)
 
     @timeit
     def get_plot(self) -> Figure:
@@ -140,19 +248,13 @@ class BaseChart:
             return
         if not self.color_scheme:
             return
-        more_values_than_color = cache_duckdb_execution(
-            _duckdb_conn=self.duckdb_conn,
-            sql_query=f"""
-            select count(distinct "{self.color_column}") as count_records
-            from {self.table_name}
-            having count(distinct "{self.color_column}") > {len(self.color_scheme)}
-        """,
-        )
-        if not more_values_than_color.empty:
+        if self.data[self.color_column].nunique() > len(self.color_scheme):
             self.color_scheme = None
 
 
 class BarChart(BaseChart):
+    supports_time_granularity = True
+    supports_top_n = True
 
     @timeit
     def get_plot(self) -> Figure:
@@ -180,6 +282,63 @@ class BarChart(BaseChart):
 
 
 class LineChart(BaseChart):
+    supports_time_granularity = True
+
+    @timeit
+    def get_sql_query(self) -> str:
+        # large series are downsampled with M4: per series and bucket of the x-axis only the first, last,
+        # lowest and highest points are kept, which draws the same line as all the points in the bucket
+        table_schema = get_table_schema(table_name=self.table_name, duckdb_conn=self.duckdb_conn)
+        x_column = table_schema.columns.get(self.dim_columns[0]) if table_schema else None
+        if not x_column or not (x_column.is_date or x_column.is_numeric):
+            return super().get_sql_query()
+
+        x_position = f'epoch("{x_column.column_name}")' if x_column.is_date else f'"{x_column.column_name}"::double'
+        series_column = f'"{self.color_column}",' if self.color_column else ""
+        return f"""
+            with chart_data as (
+                select {series_column}
+                    {self.agg_expression} as "{self.metric_column}",
+                    "{self.dim_columns[0]}"
+                from {self.from_expression}
+                {self.where_expression}
+                {self.group_by}
+            ),
+            bucketed_data as (
+                select *,
+                    least(
+                        floor(
+                            (x_position - min(x_position) over ())
+                            / nullif(max(x_position) over () - min(x_position) over (), 0)
+                            * {LINE_CHART_BUCKETS}
+                        ),
+                        {LINE_CHART_BUCKETS} - 1
+                    ) as bucket
+                from (select *, {x_position} as x_position from chart_data)
+            ),
+            m4_data as (
+                select {series_column}
+                    [
+                        min("{self.dim_columns[0]}"),
+                        arg_min("{self.dim_columns[0]}", "{self.metric_column}"),
+                        arg_max("{self.dim_columns[0]}", "{self.metric_column}"),
+                        max("{self.dim_columns[0]}")
+                    ] as x_points,
+                    [
+                        arg_min("{self.metric_column}", "{self.dim_columns[0]}"),
+                        min("{self.metric_column}"),
+                        max("{self.metric_column}"),
+                        arg_max("{self.metric_column}", "{self.dim_columns[0]}")
+                    ] as y_points
+                from bucketed_data
+                group by {series_column} bucket
+            )
+            select distinct {series_column}
+                unnest(y_points) as "{self.metric_column}",
+                unnest(x_points) as "{self.dim_columns[0]}"
+            from m4_data
+            order by {series_column} "{self.dim_columns[0]}"
+        """
 
     @timeit
     def get_plot(self) -> Figure:
@@ -236,6 +395,8 @@ class SankeyChart(BaseChart):
         color_scheme: Optional[px.colors.sequential] = px.colors.sequential.Mint,
         filter_column: str | None = None,
         filter_value: list[str] | None = None,
+        time_granularity: str = SupportedTimeGranularities.none.value,
+        top_n: int | None = None,
     ):
         super().__init__(
             duckdb_conn=duckdb_conn,
@@ -252,34 +413,44 @@ class SankeyChart(BaseChart):
             color_scheme=color_scheme,
             filter_column=filter_column,
             filter_value=filter_value,
+            time_granularity=time_granularity,
+            top_n=top_n,
         )
 
     @timeit
     def get_sql_query(self) -> str:
         dim_col_list = " ,".join([f'"{dim_col}"' for dim_col in self.dim_columns])
-
-        cubes = ""
-        union_cubes = ""
-
-        for idx in range(0, len(self.dim_columns) - 1):
-            cubes = f'("{self.dim_columns[idx]}", "{self.dim_columns[idx + 1]}"), {cubes}'
-            union_cubes = f"""
-            {union_cubes}
-            select "{self.metric_column}" as values,
-                concat('{self.dim_columns[idx]}',
-                    concat('-dummy-placeholder-',"{self.dim_columns[idx]}")
-                ) as source,
-                concat('{self.dim_columns[idx + 1]}',
-                    concat('-dummy-placeholder-',"{self.dim_columns[idx + 1]}")
-                ) as target,
-                grouping_set
-            from cube_cte
-            where "{self.dim_columns[idx]}" is not null
-                and "{self.dim_columns[idx + 1]}" is not null
-                and "{self.metric_column}" > 0
-            \n
-            {'union all' if idx < len(self.dim_columns) - 2 else ""}
+        cubes = ", ".join(
+            f'("{self.dim_columns[idx]}", "{self.dim_columns[idx + 1]}")' for idx in range(len(self.dim_columns) - 1)
+        )
+        source_column = " ".join(
+            f'when grouping("{self.dim_columns[idx]}") = 0 and grouping("{self.dim_columns[idx + 1]}") = 0 then {idx}'
+            for idx in range(len(self.dim_columns) - 1)
+        )
+        source_value = " ".join(
+            f'when {idx} then "{self.dim_columns[idx]}"::varchar' for idx in range(len(self.dim_columns) - 1)
+        )
+        target_value = " ".join(
+            f'when {idx} then "{self.dim_columns[idx + 1]}"::varchar' for idx in range(len(self.dim_columns) - 1)
+        )
+        # the values of a column outside its top SANKEY_COLUMN_VALUES_MAX by the calculation are grouped as Other
+        # before the aggregation, so the links of Other are calculated over all their rows
+        grouped_value_expressions = ", ".join(
+            f"""case
+                when "{dim_column}" is null then null
+                when "{dim_column}" in (
+                    select "{dim_column}"
+                    from {self.from_expression}
+                    {self.where_expression}
+                    group by all
+                    order by {self.agg_expression} desc, "{dim_column}"
+                    limit {SANKEY_COLUMN_VALUES_MAX}
+                ) then "{dim_column}"::varchar
+                else '{TOP_N_OTHER_VALUE}'
+            end as "{dim_column}"
             """
+            for dim_column in self.dim_columns
+        )
 
         return f"""
                 with cube_cte as (
@@ -287,61 +458,58 @@ class SankeyChart(BaseChart):
                     select
                         {self.agg_expression} as "{self.metric_column}",
                         {dim_col_list},
-                       GROUPING_ID({dim_col_list}) AS grouping_set
-                    from {self.table_name}
-                    {self.where_expression}
+                        GROUPING_ID({dim_col_list}) AS grouping_set,
+                        case {source_column} end as source_column
+                    from (
+                        select * replace ({grouped_value_expressions})
+                        from {self.from_expression}
+                        {self.where_expression}
+                    ) src
                     GROUP BY GROUPING SETS ({cubes})
                 ),
-                union_cte as (
-                    -- union all combinations of grouping sets
-                    select * from ({union_cubes})
+                link_cte as (
+                    -- every row of the cube is a link from a value of a column to a value of the next column
+                    select source_column,
+                        grouping_set,
+                        case source_column {source_value} end as source,
+                        case source_column {target_value} end as target,
+                        "{self.metric_column}" as values
+                    from cube_cte
+                    where source is not null
+                        and target is not null
+                        and values > 0
                 ),
                 label_grouping as (
                     -- retrieve per label the first occuring grouping set as source
-                    select label,
+                    select column_index,
+                        label,
                         min(grouping_set) as grouping_set,
                         sum(values) as label_value,
-                        split_part(label, '-dummy-placeholder-', 2) as label_without_placeholder
-                    from (select source as label, grouping_set, values from union_cte
+                        {get_order_clause('label')} as label_order
+                    from (select source_column as column_index, source as label, grouping_set, values from link_cte
                         union all
-                        select target as label, 1000000, values from union_cte
+                        select source_column + 1, target, 1000000, values from link_cte
                     )
-                    group by label
+                    group by column_index, label
                 ),
-                unique_grouping_set as (
-                    -- create an array with unique grouping set, to determine the position of the label
-                    select array_agg(distinct grouping_set order by grouping_set) label_grouping_uq from label_grouping
-                ),
-                x_position as (
+                label_position as (
                     -- the X axis is equaly split depending on the number of grouping sets
                     -- eg: 4 dimensions => 4 grouping sets => [0, 0.25, 0.75, 1]
-                    select label,
-                        round(
-                            round(1/{len(self.dim_columns)}, 3)
-                                *
-                            (coalesce(
-                                list_position(label_grouping_uq, grouping_set),
-                                {len(self.dim_columns)}::int)
-                            - 1),
-                        3) as label_x_position
-                        from label_grouping, unique_grouping_set
-                ),
-                y_position as (
                     -- the Y axis (per each X position) is split depending on the number of labels within a grouping set
                     -- the starting label in a grouping set will get 0.001
                     -- the next labels in a grouping set will get the position depending on the size of the label value
-                    select label,
+                    select column_index,
+                        label,
+                        row_number() over (grouping_set_label) - 1 as node_id,
+                        round(
+                            round(1/{len(self.dim_columns)}, 3) * (dense_rank() over (order by grouping_set) - 1),
+                        3) as label_x_position,
                         lead(grouping_set) over (grouping_set_label) as next_grouping_set,
                         lag(grouping_set) over (grouping_set_label) as previous_grouping_set,
                         count(label_value) over (partition by grouping_set) as number_labels_in_group,
-                        count(label_value) over (
-                            partition by grouping_set order by {get_order_clause('label_without_placeholder')}
-                        ) as number_labels_to_label,
-                        max(label_value) over (partition by grouping_set) max_value,
-                        min(label_value) over (partition by grouping_set) min_value,
                         sum(label_value) over (partition by grouping_set) as grouping_set_total_value,
                         sum(label_value) over (
-                            partition by grouping_set order by {get_order_clause('label_without_placeholder')}
+                            partition by grouping_set order by label = '{TOP_N_OTHER_VALUE}', label_order
                         ) as grouping_set_running_value,
                         case when number_labels_in_group <= 4
                             then 0.3
@@ -363,36 +531,48 @@ class SankeyChart(BaseChart):
                         end, 3) label_y_position
                     from label_grouping
                     window grouping_set_label as (
-                        order by grouping_set, {get_order_clause('label_without_placeholder')}
+                        order by grouping_set, label = '{TOP_N_OTHER_VALUE}', label_order, column_index
                     )
                 ),
-                idx_cte as (
-                    -- aggregate in an array the label and x,y positions
+                node_cte as (
+                    -- aggregate in an array the label and x,y positions, ordered by the id of the label
                     select
-                        array_agg(x_position.label) as label,
-                        array_agg(case
+                        list(label order by node_id) as label,
+                        list(case
                             when label_x_position <=0 then 0.001
                             when label_x_position >=1 then 0.999
                             else label_x_position end
-                        ) as label_x_position,
-                        array_agg(case
+                        order by node_id) as label_x_position,
+                        list(case
                             when label_y_position<=0 then 0.001
                             when label_y_position>=1 then 0.999
                             else label_y_position end
-                        ) as label_y_position
-                    from x_position
-                    join y_position
-                    on x_position.label = y_position.label
+                        order by node_id) as label_y_position
+                    from label_position
+                ),
+                link_id_cte as (
+                    -- aggregate in an array the ids of the source and the target labels of the links
+                    select
+                        array_agg(source_label.node_id) as source,
+                        array_agg(target_label.node_id) as target,
+                        array_agg(link_cte.values) as values
+                    from link_cte
+                    join label_position source_label
+                        on source_label.column_index = link_cte.source_column
+                        and source_label.label = link_cte.source
+                    join label_position target_label
+                        on target_label.column_index = link_cte.source_column + 1
+                        and target_label.label = link_cte.target
+                    having count(*) > 0
                 )
                 select
-                    list_transform(label, x -> split_part(x, '-dummy-placeholder-', 2)) as label,
-                    label_x_position,
-                    label_y_position,
-                    array_agg(list_position(idx_cte.label, source::varchar) - 1) as source,
-                    array_agg(list_position(idx_cte.label, target::varchar) - 1) as target,
-                    array_agg(values) as values
-                from union_cte, idx_cte
-                group by all
+                    node_cte.label,
+                    node_cte.label_x_position,
+                    node_cte.label_y_position,
+                    link_id_cte.source,
+                    link_id_cte.target,
+                    link_id_cte.values
+                from node_cte, link_id_cte
                 """
 
     @timeit
@@ -444,50 +624,80 @@ class SankeyChart(BaseChart):
 
 
 class HeatMapChart(BaseChart):
-
     @timeit
     def get_sql_query(self) -> str:
+        # every row of the result is a row of the matrix, the values of its cells are a list ordered by the x-axis
+        # a cell without data is 0, a cell of a chart without aggregation is the average of its values
+        cell_expression = (
+            f'avg(try_cast("{self.metric_column}" as decimal))'
+            if self.aggregation_method == SupportedAggregationMethods.none
+            else self.agg_expression
+        )
         return f"""
-            with existing_data as (
+            with heatmap_data as (
+                select
+                    {cell_expression} as "{self.metric_column}",
+                    "{self.dim_columns[0]}",
+                    "{self.dim_columns[1]}"
+                from {self.from_expression}
+                {self.where_expression}
+                group by all
+            ),
+            x_axis as (
+                select "{self.dim_columns[0]}",
+                    row_number() over (order by {get_order_clause(self.dim_columns[0])}) as "x position xyz",
+                    count(*) over () as "x values xyz"
+                from (select distinct "{self.dim_columns[0]}" from heatmap_data) src
+                where "{self.dim_columns[0]}" is not null
+                qualify "x position xyz" <= {HEATMAP_AXIS_MAX}
+            ),
+            y_axis as (
+                select "{self.dim_columns[1]}",
+                    row_number() over (order by {get_order_clause(self.dim_columns[1])}) as "y position xyz",
+                    count(*) over () as "y values xyz"
+                from (select distinct "{self.dim_columns[1]}" from heatmap_data) src
+                where "{self.dim_columns[1]}" is not null
+                qualify "y position xyz" <= {HEATMAP_AXIS_MAX}
+            )
             select
-                {self.agg_expression} as "{self.metric_column}",
-                "{self.dim_columns[0]}",
-                "{self.dim_columns[1]}"
-            from {self.table_name}
-            {self.where_expression}
-            {self.group_by}),
-            unique_dim_col_0 as (select distinct "{self.dim_columns[0]}" from {self.table_name}
-            {self.where_expression}),
-            unique_dim_col1 as (select distinct "{self.dim_columns[1]}" from {self.table_name}
-            {self.where_expression})
-            select * from (
-                select *
-                from existing_data
-                union all
-                select distinct 0,
-                    col0."{self.dim_columns[0]}",
-                    col1."{self.dim_columns[1]}"
-                from unique_dim_col_0 col0, unique_dim_col1 col1
-                where not exists( select 1
-                    from existing_data src
-                    where src."{self.dim_columns[0]}" = col0."{self.dim_columns[0]}"
-                    and src."{self.dim_columns[1]}" = col1."{self.dim_columns[1]}"
-                    )
-            ) with_fill_null
-            order by {get_order_clause(self.dim_columns[1])}, {get_order_clause(self.dim_columns[0])}
+                y_axis."{self.dim_columns[1]}",
+                list(
+                    coalesce(heatmap_data."{self.metric_column}", 0) order by x_axis."x position xyz"
+                ) as "cell values xyz",
+                (
+                    select list("{self.dim_columns[0]}"::varchar order by "x position xyz") from x_axis
+                ) as "x labels xyz",
+                (select any_value("x values xyz") from x_axis) as "x values xyz",
+                any_value(y_axis."y values xyz") as "y values xyz"
+            from y_axis
+            cross join x_axis
+            left join heatmap_data
+                on heatmap_data."{self.dim_columns[0]}" = x_axis."{self.dim_columns[0]}"
+                and heatmap_data."{self.dim_columns[1]}" = y_axis."{self.dim_columns[1]}"
+            group by y_axis."y position xyz", y_axis."{self.dim_columns[1]}"
+            order by y_axis."y position xyz"
         """
 
     @timeit
-    def get_plot(self) -> Figure:
-        pivoted_data = self.data.pivot_table(
-            index=self.dim_columns[1], columns=self.dim_columns[0], values=self.metric_column, sort=False
-        )
+    def get_data(self):
+        data = super().get_data()
+        self.x_labels = list(data["x labels xyz"].iloc[0]) if not data.empty else []
+        self.x_values = int(data["x values xyz"].iloc[0]) if not data.empty else 0
+        self.y_values = int(data["y values xyz"].iloc[0]) if not data.empty else 0
+        return data
 
+    @timeit
+    def get_category_orders(self):
+        # the rows and columns of the matrix are ordered in sql
+        return {}
+
+    @timeit
+    def get_plot(self) -> Figure:
         fig = px.imshow(
-            pivoted_data.to_numpy(),
-            labels=dict(x=self.dim_columns[0], y=self.color_column, color=self.metric_column),
-            x=list(pivoted_data.columns),
-            y=list(pivoted_data.index),
+            np.stack(self.data["cell values xyz"].to_numpy()) if not self.data.empty else np.empty((0, 0)),
+            labels=dict(x=self.dim_columns[0], y=self.dim_columns[1], color=self.metric_column),
+            x=self.x_labels,
+            y=list(self.data[self.dim_columns[1]]),
             color_continuous_scale=self.color_scheme,
             text_auto=".2f",
             aspect="auto",
@@ -498,49 +708,150 @@ class HeatMapChart(BaseChart):
 
 
 class ScatterChart(BaseChart):
+    def __init__(
+        self,
+        duckdb_conn: DuckDBPyConnection,
+        metric_column: str,
+        dim_columns: [str],
+        color_column: str | None,
+        orientation: str | None,
+        table_name: str,
+        aggregation_method: str = SupportedAggregationMethods.count.value,
+        color_scheme: list[str] | None = None,
+        filter_column: str | None = None,
+        filter_value: str | None = None,
+        time_granularity: str = SupportedTimeGranularities.none.value,
+        top_n: int | None = None,
+        max_points: int = SCATTER_CHART_MAX_POINTS,
+        density_heatmap: bool = False,
+    ):
+        self.max_points = max_points
+        self.density_heatmap = density_heatmap
+        self.total_points = 0
+        super().__init__(
+            duckdb_conn=duckdb_conn,
+            metric_column=metric_column,
+            dim_columns=dim_columns,
+            color_column=color_column,
+            orientation=orientation,
+            table_name=table_name,
+            aggregation_method=aggregation_method,
+            color_scheme=color_scheme,
+            filter_column=filter_column,
+            filter_value=filter_value,
+            time_granularity=time_granularity,
+            top_n=top_n,
+        )
 
     @timeit
     def validate_color_scheme(self):
-        if not self.color_column:
+        if not self.color_column or self.color_column not in self.data.columns:
             return
 
-        check_color_column_numeric = cache_duckdb_execution(
-            _duckdb_conn=self.duckdb_conn,
-            sql_query=f"""
-                select *
-                from {self.table_name}
-                where try_cast("{self.color_column}" as numeric) is null
-                limit 1
-            """,
-        )
-        if not check_color_column_numeric.empty:
+        if not is_numeric_dtype(self.data[self.color_column]):
             super().validate_color_scheme()
 
-    @timeit
-    def get_sql_query(self) -> str:
-        if not self.color_column:
-            return f"""
-                select
-                    {self.agg_expression} as "{self.metric_column}",
-                    "{self.dim_columns[0]}",
-                    "{self.dim_columns[1]}"
-                from {self.table_name}
-                {self.where_expression}
-                {self.group_by}
-            """
+    def get_points_sql_query(self) -> str:
+        color_column = f', "{self.color_column}"' if self.color_column else ""
         return f"""
             select
                 {self.agg_expression} as "{self.metric_column}",
                 "{self.dim_columns[0]}",
-                "{self.dim_columns[1]}",
-                "{self.color_column}"
+                "{self.dim_columns[1]}"
+                {color_column}
             from {self.table_name}
             {self.where_expression}
             {self.group_by}
         """
 
+    @timeit
+    def get_sql_query(self) -> str:
+        # the browser draws at most max_points points, sampled from all of them, which are counted by the same scan;
+        # the sample is the max_points points with the smallest hash, only them are kept while scanning
+        return f"""
+            with sample_data as (
+                select count(*) as "total points xyz",
+                    min_by("points xyz", hash("points xyz"), {self.max_points}) as "sample xyz"
+                from ({self.get_points_sql_query()}) "points xyz"
+            )
+            select unnest("sample xyz", recursive := true), "total points xyz"
+            from sample_data
+        """
+
+    @timeit
+    def get_density_sql_query(self) -> str:
+        # the points are counted per bin of the x and y axes, the bin is represented by its center
+        bin_expressions = [
+            f'{axis}_min + (least(floor(("{dim_column}" - {axis}_min) / nullif({axis}_width, 0)), '
+            f'{SCATTER_CHART_DENSITY_BINS} - 1) + 0.5) * coalesce({axis}_width, 0) as "{dim_column}"'
+            for axis, dim_column in zip(("x", "y"), self.dim_columns)
+        ]
+        return f"""
+            with chart_data as ({self.get_points_sql_query()}),
+            bounds as (
+                select min("{self.dim_columns[0]}")::double as x_min,
+                    (max("{self.dim_columns[0]}") - min("{self.dim_columns[0]}"))::double
+                        / {SCATTER_CHART_DENSITY_BINS} as x_width,
+                    min("{self.dim_columns[1]}")::double as y_min,
+                    (max("{self.dim_columns[1]}") - min("{self.dim_columns[1]}"))::double
+                        / {SCATTER_CHART_DENSITY_BINS} as y_width
+                from chart_data
+            )
+            select {", ".join(bin_expressions)},
+                count(*) as "Number of points"
+            from chart_data, bounds
+            group by all
+        """
+
+    def is_numeric_axes(self) -> bool:
+        table_schema = get_table_schema(table_name=self.table_name, duckdb_conn=self.duckdb_conn)
+        return bool(table_schema) and all(
+            table_schema.columns.get(dim_column) and table_schema.columns[dim_column].is_numeric
+            for dim_column in self.dim_columns
+        )
+
+    def get_sample_data(self):
+        data = super().get_data()
+        self.total_points = int(data["total points xyz"].iloc[0]) if not data.empty else 0
+        return data.drop(columns="total points xyz")
+
+    @timeit
+    def get_data(self):
+        # with the density enabled its bins count the points, so the table is only scanned again for a sample
+        # when there are too few points for the density
+        if not (self.density_heatmap and self.is_numeric_axes()):
+            return self.get_sample_data()
+
+        density_sql_query = self.get_density_sql_query()
+        density_data = arrow_to_pandas(
+            cache_duckdb_execution(duckdb_conn=self.duckdb_conn, sql_query=density_sql_query)
+        )
+        self.total_points = int(density_data["Number of points"].sum())
+        if self.total_points > SCATTER_CHART_DENSITY_THRESHOLD:
+            # above the threshold a sample hides the shape of the data, the density of all the points shows it
+            self.sql_query = density_sql_query
+            return density_data
+        return self.get_sample_data()
+
+    @property
+    def is_density(self) -> bool:
+        return "Number of points" in self.data.columns
+
     @timeit
     def get_plot(self) -> Figure:
+        if self.is_density:
+            # the bins are counted in sql, their centers are drawn as they are instead of being binned again
+            fig = go.Figure(
+                go.Heatmap(
+                    x=self.data[self.dim_columns[0]],
+                    y=self.data[self.dim_columns[1]],
+                    z=self.data["Number of points"],
+                    colorscale=self.color_scheme,
+                    colorbar_title="Number of points",
+                )
+            )
+            fig.update_layout(xaxis_title=self.dim_columns[0], yaxis_title=self.dim_columns[1])
+            return fig
         return px.scatter(
             self.data,
             x=self.dim_columns[0],
@@ -550,6 +861,7 @@ class ScatterChart(BaseChart):
             category_orders=self.category_orders,
             color_discrete_sequence=self.color_scheme,
             color_continuous_scale=self.color_scheme,
+            render_mode="webgl",
         )
 
 
@@ -567,6 +879,7 @@ class WorldMapChart(BaseChart):
 
 
 class PieChart(BaseChart):
+    supports_top_n = True
 
     @timeit
     def get_plot(self) -> Figure:
@@ -617,3 +930,7 @@ class ChartConfiguration:
     filter_column: str | None
     filter_value: str | None
     hide_legend: bool = False
+    time_granularity: str = SupportedTimeGranularities.none.value
+    top_n: int | None = None
+    max_points: int = SCATTER_CHART_MAX_POINTS
+    density_heatmap: bool = False
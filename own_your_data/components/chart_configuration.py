@@ -1,7 +1,11 @@
 import streamlit as st
 
+from own_your_data.charts.constants import SCATTER_CHART_DENSITY_THRESHOLD
+from own_your_data.charts.constants import SCATTER_CHART_MAX_POINTS
+from own_your_data.charts.constants import TOP_N_OTHER_VALUE
 from own_your_data.charts.constants import SupportedAggregationMethods
 from own_your_data.charts.constants import SupportedPlots
+from own_your_data.charts.constants import SupportedTimeGranularities
 from own_your_data.charts.definition import PLOT_TYPE_TO_CHART_CLASS
 from own_your_data.charts.definition import PLOT_TYPE_TO_COLOR_CLASS
 from own_your_data.charts.definition import ChartConfiguration
@@ -9,6 +13,10 @@ from own_your_data.components.data_analysis import get_columns
 from own_your_data.utils import cache_duckdb_execution
 from own_your_data.utils import get_duckdb_conn
 from own_your_data.utils import get_plotly_colors
+from own_your_data.utils import get_read_table_names
+from own_your_data.utils import get_read_table_versions
+from own_your_data.utils import get_result_cache
+from own_your_data.utils import get_table_schema
 from own_your_data.utils import timeit
 
 
@@ -31,6 +39,8 @@ def get_chart_configuration(table_name: str) -> ChartConfiguration | None:
     )
 
     requirements_met = False
+    max_points = SCATTER_CHART_MAX_POINTS
+    density_heatmap = False
     dim_columns = None
     orientation = None
     metric_column = st.selectbox("Calculation column", columns, index=None)
@@ -119,6 +129,21 @@ def get_chart_configuration(table_name: str) -> ChartConfiguration | None:
                     requirements_met = True
 
         case SupportedPlots.scatter:
+            max_points = st.number_input(
+                "Maximum points",
+                min_value=1_000,
+                max_value=1_000_000,
+                value=SCATTER_CHART_MAX_POINTS,
+                step=1_000,
+                help="When there are more points, a random sample of them is drawn",
+            )
+            density_heatmap = st.checkbox(
+                "Density heatmap for many points",
+                help=f"""
+                    With more than {SCATTER_CHART_DENSITY_THRESHOLD:,} points and numeric axes,
+                    the number of points is shown per area of the chart, instead of a sample of them
+                """,
+            )
             if all([metric_column, x_column, metric_column, y_column]):
                 dim_columns = [x_column, y_column]
                 orientation = None
@@ -152,6 +177,37 @@ def get_chart_configuration(table_name: str) -> ChartConfiguration | None:
     if not requirements_met:
         return None
 
+    time_granularity = SupportedTimeGranularities.none.value
+    table_schema = get_table_schema(table_name=table_name)
+    x_column_schema = table_schema.columns.get(x_column) if table_schema and x_column else None
+    if plot_type in [SupportedPlots.bar, SupportedPlots.line] and x_column_schema and x_column_schema.is_date:
+        time_granularity = st.selectbox(
+            "Time granularity",
+            SupportedTimeGranularities.list(),
+            # the existing charts keep every distinct date, the range of the dates is only queried for auto
+            index=SupportedTimeGranularities.list().index(SupportedTimeGranularities.none.value),
+            help="""
+                Group the X-axis by hour, day, week, month, quarter or year.
+                Auto picks the granularity from the range of the dates, none, the default, keeps every distinct value.
+            """,
+        )
+
+    top_n = None
+    if aggregation_method != SupportedAggregationMethods.none and (
+        plot_type in [SupportedPlots.bar, SupportedPlots.pie]
+        or (color_column and plot_type in [SupportedPlots.line, SupportedPlots.world_map])
+    ):
+        top_n = st.number_input(
+            "Top values",
+            min_value=1,
+            value=None,
+            step=1,
+            help=f"""
+                Show only the values with the highest calculation, the rest are grouped as {TOP_N_OTHER_VALUE}.
+                It applies to the dimension of bar and pie charts and to the color column.
+            """,
+        )
+
     filter_column = st.selectbox("Filter on", columns, index=None)
     filter_value = None
 
@@ -161,7 +217,7 @@ def get_chart_configuration(table_name: str) -> ChartConfiguration | None:
             "Exact match on",
             cache_duckdb_execution(
                 duckdb_conn,
-                f"""
+                sql_query=f"""
                 select "{filter_column}" from (
                     select "{filter_column}", count(*) as cnt
                     from {table_name}
@@ -170,7 +226,9 @@ def get_chart_configuration(table_name: str) -> ChartConfiguration | None:
                 order by cnt desc
                 limit 100
             """,
-            ),
+            )
+            .column(0)
+            .to_pylist(),
             index=None,
             key="exact-match-on",
             help="The top 100 most encountered values",
@@ -193,6 +251,10 @@ def get_chart_configuration(table_name: str) -> ChartConfiguration | None:
         color_label=color_column,
         filter_column=filter_column,
         filter_value=str(filter_value) if filter_value else None,
+        time_granularity=time_granularity,
+        top_n=top_n,
+        max_points=max_points,
+        density_heatmap=density_heatmap,
     )
 
 
@@ -256,7 +318,6 @@ def get_chart_layout(chart_configuration: ChartConfiguration | None) -> ChartCon
     return chart_configuration
 
 
-@st.cache_resource
 def get_cached_plot(
     plot_type: SupportedPlots,
     metric_column: str,
@@ -268,25 +329,60 @@ def get_cached_plot(
     color_scheme: list[str] | None,
     filter_column: str | None,
     filter_value: list[str] | None,
+    time_granularity: str = SupportedTimeGranularities.none.value,
+    top_n: int | None = None,
+    max_points: int = SCATTER_CHART_MAX_POINTS,
+    density_heatmap: bool = False,
 ):
+    # the plots share the result cache with the queries, keyed by their configuration and the table versions
     duckdb_conn = get_duckdb_conn()
     chart_class = PLOT_TYPE_TO_CHART_CLASS.get(plot_type)
 
     if not chart_class:
         raise NotImplementedError(f"There is not implementation for {plot_type}")
 
-    return chart_class(
-        duckdb_conn=duckdb_conn,
-        metric_column=metric_column,
-        dim_columns=dim_columns,
-        color_column=color_column,
-        orientation=orientation,
-        aggregation_method=aggregation_method,
-        table_name=table_name,
-        color_scheme=color_scheme,
-        filter_column=filter_column,
-        filter_value=filter_value,
+    result_cache = get_result_cache()
+    table_names = get_read_table_names(duckdb_conn=duckdb_conn, sql_query=f"from {table_name}")
+    plot_key = (
+        "plot",
+        plot_type,
+        metric_column,
+        tuple(dim_columns),
+        color_column,
+        orientation,
+        aggregation_method,
+        table_name,
+        tuple(color_scheme or []),
+        filter_column,
+        filter_value,
+        time_granularity,
+        top_n,
+        max_points,
+        density_heatmap,
+        get_read_table_versions(table_names=table_names),
+    )
+    chart_options = (
+        {"max_points": max_points, "density_heatmap": density_heatmap} if plot_type == SupportedPlots.scatter else {}
     )
+    chart = result_cache.get(plot_key)
+    if chart is None:
+        chart = chart_class(
+            duckdb_conn=duckdb_conn,
+            metric_column=metric_column,
+            dim_columns=dim_columns,
+            color_column=color_column,
+            orientation=orientation,
+            aggregation_method=aggregation_method,
+            table_name=table_name,
+            color_scheme=color_scheme,
+            filter_column=filter_column,
+            filter_value=filter_value,
+            time_granularity=time_granularity,
+            top_n=top_n,
+            **chart_options,
+        )
+        result_cache.put(plot_key, chart, size=int(chart.data.memory_usage(deep=True).sum()), table_names=table_names)
+    return chart
 
 
 @timeit
@@ -302,7 +398,29 @@ def get_charts_components(chart_configuration: ChartConfiguration):
         color_scheme=chart_configuration.color_scheme,
         filter_column=chart_configuration.filter_column,
         filter_value=chart_configuration.filter_value,
+        time_granularity=chart_configuration.time_granularity,
+        top_n=chart_configuration.top_n,
+        max_points=chart_configuration.max_points,
+        density_heatmap=chart_configuration.density_heatmap,
     )
+    if chart_class.time_granularity:
+        # auto is recorded as the granularity it picked
+        chart_configuration.time_granularity = chart_class.time_granularity
+        st.caption(f"The X-axis is grouped by {chart_class.time_granularity}")
+    if chart_configuration.plot_type == SupportedPlots.scatter and chart_class.is_density:
+        st.caption(f"The density of {chart_class.total_points:,} points")
+    elif chart_configuration.plot_type == SupportedPlots.scatter and chart_class.total_points > len(chart_class.data):
+        st.caption(
+            f"A sample of {len(chart_class.data):,} of {chart_class.total_points:,} points "
+            f"({len(chart_class.data) / chart_class.total_points:.1%})"
+        )
+    if chart_configuration.plot_type == SupportedPlots.heatmap and (
+        chart_class.x_values > len(chart_class.x_labels) or chart_class.y_values > len(chart_class.data)
+    ):
+        st.caption(
+            f"The heatmap shows the first {len(chart_class.x_labels):,} of {chart_class.x_values:,} values "
+            f"of the X-axis and {len(chart_class.data):,} of {chart_class.y_values:,} values of the Y-axis"
+        )
 
     fig_plot = chart_class.plot
     sql_query = chart_class.sql_query
@@ -1,20 +1,73 @@
+import datetime
+import hashlib
+import os
 import re
-from io import BytesIO
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from glob import has_magic
+from itertools import chain
 from pathlib import Path
 from typing import IO
 from zipfile import ZipFile
 
+from duckdb import DuckDBPyConnection
+from duckdb import DuckDBPyRelation
+from fsspec.core import url_to_fs
+from fsspec.implementations.local import LocalFileSystem
+from pyarrow.dataset import dataset
 from streamlit.runtime.uploaded_file_manager import UploadedFile
 
+from own_your_data.utils import IMPORT_REJECTS_PREFIX
 from own_your_data.utils import gather_database_size
 from own_your_data.utils import get_duckdb_conn
+from own_your_data.utils import get_import_conn
+from own_your_data.utils import invalidate_table_cache
 from own_your_data.utils import timeit
 
+IMPORT_CHUNK_SIZE = 16 * 1024 * 1024
+IMPORT_MAX_WORKERS = min(8, os.cpu_count() or 1)
+IMPORT_FILE_TYPES = ["csv", "txt", "tsv", "gz", "zst", "parquet", "json", "ndjson", "jsonl", "arrow", "feather", "ipc"]
+IMPORT_ZIP_MEMBER_EXTENSIONS = tuple(f".{file_type}" for file_type in IMPORT_FILE_TYPES)
+IMPORT_ENUM_MAX_CARDINALITY = 1024
+IMPORT_DECIMAL_MAX_SCALE = 4
+IMPORT_NARROWED_COMMENT = "narrowed from "
+
+
+def is_virtual_table(table_name: str) -> bool:
+    # a table with virtual auto columns is a view over its base table
+    duckdb_conn = get_import_conn()
+    return bool(
+        duckdb_conn.execute(
+            f"select 1 from duckdb_views where view_name = '{table_name}' and schema_name = 'main'"
+        ).fetchone()
+    )
+
 
 @gather_database_size
 def cleanup_db(table_name):
-    duckdb_conn = get_duckdb_conn()
+    duckdb_conn = get_import_conn()
+    if is_virtual_table(table_name=table_name):
+        duckdb_conn.execute(f"drop view {table_name}")
+        table_name = f"{table_name.removesuffix('_t')}_base_t"
     duckdb_conn.execute(f"drop table  if exists {table_name}")
+    # the rejected lines of the imports into the table go with it
+    for (rejects_table_name,) in duckdb_conn.execute(
+        "select rejects_table_name from file_import_metadata where table_name = ? and rejects_table_name is not null",
+        [table_name],
+    ).fetchall():
+        duckdb_conn.execute(f"drop table if exists {rejects_table_name}")
+    duckdb_conn.execute(
+        """
+        update file_import_metadata set rejects_table_name = null
+        where table_name = ? and rejects_table_name is not null
+    """,
+        [table_name],
+    )
+
+
+def quote_sql_string(value: str) -> str:
+    return "'" + value.replace("'", "''") + "'"
 
 
 def clean_column_name(column_name: str) -> str:
@@ -26,49 +79,147 @@ def get_table_name(file_name: str) -> str:
     return f"file_{cleaned_table_name.lower()}"
 
 
+def get_import_dir() -> Path:
+    import_dir = Path(f"{str(Path.home())}/own-your-data/imports")
+    import_dir.mkdir(parents=True, exist_ok=True)
+    return import_dir
+
+
 @timeit
-def get_unzipped_data(data_source: UploadedFile) -> list[IO[bytes]]:
+def spill_uploaded_file(data_source: UploadedFile | IO[bytes], file_name: str, import_dir: str) -> Path:
+    # copy the upload in chunks, duckdb reads the file from disk with its parallel csv reader
+    file_path = Path(import_dir) / Path(file_name).name
+    data_source.seek(0)
+    with open(file_path, "wb") as spilled_file:
+        shutil.copyfileobj(data_source, spilled_file, IMPORT_CHUNK_SIZE)
+    return file_path
+
+
+def extract_zip_member(member_name: str, data_source: Path, import_dir: str) -> Path:
+    # every worker opens its own handle, a ZipFile is not meant to be shared between threads
     with ZipFile(data_source) as imported_zip:
-        return [imported_zip.open(file) for file in imported_zip.namelist() if file.endswith((".csv", ".txt"))]
+        return Path(imported_zip.extract(member_name, path=f"{import_dir}/{data_source.stem}"))
+
+
+def get_content_hash(data_source: Path | str) -> str:
+    content_hash = hashlib.sha256()
+    with open(data_source, "rb") as imported_file:
+        while chunk := imported_file.read(IMPORT_CHUNK_SIZE):
+            content_hash.update(chunk)
+    return content_hash.hexdigest()
+
+
+def get_import_hash(content_hash: str, import_options: dict) -> str:
+    # the same content imported with other options results in another table, so it is imported again
+    return hashlib.sha256(f"{content_hash}{sorted(import_options.items())}".encode()).hexdigest()
+
+
+def is_already_imported(table_name: str, content_hash: str) -> bool:
+    # the same content, with the same options, was imported last into a table which still exists
+    duckdb_conn = get_import_conn()
+    last_import = duckdb_conn.execute(
+        f"""
+        select content_hash = '{content_hash}'
+        from file_import_metadata
+        where table_name = '{table_name}_t'
+        and parent_id is null
+        and end_import_datetime is not null
+        and exists (select 1 from duckdb_tables where table_name = '{table_name}_t')
+        order by id desc
+        limit 1
+    """
+    ).fetchone()
+    return bool(last_import and last_import[0])
+
+
+@timeit
+def get_unzipped_data(data_source: Path, import_dir: str) -> list[Path]:
+    with ZipFile(data_source) as imported_zip:
+        member_names = [file for file in imported_zip.namelist() if file.endswith(IMPORT_ZIP_MEMBER_EXTENSIONS)]
+    with ThreadPoolExecutor(max_workers=IMPORT_MAX_WORKERS) as executor:
+        return list(
+            executor.map(partial(extract_zip_member, data_source=data_source, import_dir=import_dir), member_names)
+        )
+
+
+def read_data_source(
+    duckdb_conn: DuckDBPyConnection, data_source: list[Path] | list[str], rejects_table_name: str | None = None
+) -> DuckDBPyRelation:
+    # the files of one import have the same format, csv is the default, also when compressed as .gz or .zst
+    # with a rejects table, the csv lines which cannot be read are stored in it instead of failing the import,
+    # duckdb does not combine it with union by name, so the files need the same columns
+    file_paths = [str(file_path) for file_path in data_source]
+    match Path(file_paths[0]).suffix.lower():
+        case ".parquet":
+            return duckdb_conn.read_parquet(file_paths, union_by_name=True)
+        case ".json" | ".ndjson" | ".jsonl":
+            return duckdb_conn.read_json(file_paths)
+        case ".arrow" | ".feather" | ".ipc":
+            return duckdb_conn.from_arrow(dataset(file_paths, format="ipc"))
+        case _ if rejects_table_name:
+            # read_csv of the python api sniffs a single varchar column when storing the rejects
+            return duckdb_conn.sql(
+                f"""
+                from read_csv([{",".join(quote_sql_string(value=file_path) for file_path in file_paths)}],
+                    store_rejects = true,
+                    rejects_table = '{rejects_table_name}_errors', rejects_scan = '{rejects_table_name}_scans')
+            """
+            )
+        case _:
+            return duckdb_conn.read_csv(file_paths, union_by_name=True)
+
+
+def get_data_source_size(data_source: list[Path] | list[str]) -> int:
+    file_system, _ = url_to_fs(str(data_source[0]))
+    return sum(file_system.size(str(file_path)) for file_path in data_source)
 
 
 @timeit
 @gather_database_size
-def import_uploaded_file(data_source: list[UploadedFile] | list[IO[bytes]], table_name, file_name):
-    duckdb_conn = get_duckdb_conn()
-    imported_data = duckdb_conn.read_csv(data_source)  # NOQA
-    duckdb_conn.execute(f"create table {table_name} as select * from imported_data")
+def import_uploaded_file(
+    data_source: list[Path] | list[str],
+    table_name,
+    file_name,
+    content_hash: str | None = None,
+    store_rejects: bool = False,
+) -> DuckDBPyRelation:
+    # the relation is lazy, only the schema is sniffed here, the data is read once by process_imported_data
+    duckdb_conn = get_import_conn()
+    rejects_table_name = None
+    if store_rejects:
+        # the rejects of the scan are collected in temporary tables of the connection, see store_rejected_rows
+        rejects_table_name = f"{table_name}_rejects"
+        duckdb_conn.execute(f"drop table if exists temp.{rejects_table_name}_errors")
+        duckdb_conn.execute(f"drop table if exists temp.{rejects_table_name}_scans")
+    imported_data = read_data_source(
+        duckdb_conn=duckdb_conn, data_source=data_source, rejects_table_name=rejects_table_name
+    )
 
     duckdb_conn.execute(
         f"""
         insert into file_import_metadata
-        (file_name, table_name, start_import_datetime)
+        (file_name, table_name, start_import_datetime, content_hash, status, phase, bytes_total)
             values
-        ('{file_name}', '{table_name}_t', current_timestamp)
-    """
+        (?, '{table_name}_t', current_timestamp, ?, 'running', 'reading', ?)
+    """,
+        [file_name, content_hash, get_data_source_size(data_source=data_source)],
     )
+    return imported_data
 
 
-def get_auto_column_expressions(table_name) -> list[str]:
+def get_auto_column_expressions(imported_data: DuckDBPyRelation) -> list[str]:
     # from timestamp to date
     # from date to year, month name, day name
-    duckdb_conn = get_duckdb_conn()
-    date_related_columns = duckdb_conn.execute(
-        f"""
-        select column_name,
-            case when data_type like 'TIMESTAMP%' then true else false end is_timestamp
-        from duckdb_columns a
-        where a.table_name='{table_name}'
-        and (a.data_type = 'DATE' or a.data_type like 'TIMESTAMP%')
-        and column_name not like '% Date Auto'
-        and not exists (
-            select 1
-            from duckdb_columns b
-            where a.table_name = b.table_name
-            and b.column_name like concat(a.column_name, ' % Auto')
+    date_related_columns = [
+        (column_name, str(data_type).startswith("TIMESTAMP"))
+        for column_name, data_type in zip(imported_data.columns, imported_data.types)
+        if (str(data_type) == "DATE" or str(data_type).startswith("TIMESTAMP"))
+        and not column_name.endswith(" Date Auto")
+        and not any(
+            other_column_name.startswith(f"{column_name} ") and other_column_name.endswith(" Auto")
+            for other_column_name in imported_data.columns
         )
-        """
-    ).fetchall()
+    ]
 
     auto_column_expressions = [
         f"""
@@ -88,37 +239,319 @@ def get_auto_column_expressions(table_name) -> list[str]:
     return auto_column_expressions
 
 
-@timeit
-@gather_database_size
-def process_imported_data(table_name: str, add_auto_columns: bool = True):
-    duckdb_conn = get_duckdb_conn()
-    auto_column_expressions = get_auto_column_expressions(table_name=table_name) if add_auto_columns else None
+def get_column_selection(imported_data: DuckDBPyRelation, add_auto_columns: bool) -> list[str]:
     column_selection = [
-        f'"{column[0]}" as "{" ".join(re.sub("[^A-Za-z0-9 ]+", " ", column[0]).title().split())}"'
-        for column in duckdb_conn.execute(
-            f"select column_name from duckdb_columns where table_name='{table_name}'"
-        ).fetchall()
+        f'"{column_name}" as "{clean_column_name(column_name=column_name)}"' for column_name in imported_data.columns
     ]
-    if auto_column_expressions:
-        column_selection.extend(auto_column_expressions)
+    if add_auto_columns:
+        column_selection.extend(get_auto_column_expressions(imported_data=imported_data))
+    return column_selection
 
+
+def get_order_by_expression(
+    imported_data: DuckDBPyRelation, column_selection: list[str], sort_by_date: bool, sort_column: str | None
+) -> str:
+    # rows with close values are written in the same row groups,
+    # so their min/max statistics let duckdb skip most of the table when filtering on these columns
+    order_by_columns = []
+    if sort_by_date:
+        order_by_columns.extend(
+            [
+                clean_column_name(column_name=column_name)
+                for column_name, data_type in zip(imported_data.columns, imported_data.types)
+                if str(data_type) == "DATE" or str(data_type).startswith("TIMESTAMP")
+            ][:1]
+        )
+    if sort_column:
+        if sort_column not in imported_data.project(",".join(column_selection)).columns:
+            raise ValueError(f"The column {sort_column} does not exist in the imported data")
+        order_by_columns.append(sort_column)
+    if not order_by_columns:
+        return ""
+    return "order by " + ",".join(f'"{column}"' for column in order_by_columns)
+
+
+def get_import_id(table_name: str) -> int:
+    duckdb_conn = get_import_conn()
+    return duckdb_conn.execute(
+        f"""
+        select max(id) from file_import_metadata where table_name = '{table_name}_t' and parent_id is null
+    """
+    ).fetchone()[0]
+
+
+def store_rejected_rows(table_name: str):
+    # the rejected lines are kept in a table per import, linked from its metadata,
+    # only csv files have rejects tables, the other formats are read by their own readers
+    duckdb_conn = get_import_conn()
+    if not duckdb_conn.execute(
+        f"select 1 from duckdb_tables where temporary and table_name = '{table_name}_rejects_errors'"
+    ).fetchone():
+        return
+    import_id = get_import_id(table_name=table_name)
+    rejected_row_count = duckdb_conn.execute(
+        f"""
+        create table {IMPORT_REJECTS_PREFIX}{import_id} as
+        select distinct scans.file_path, errors.line, errors.column_name, errors.error_type,
+            errors.csv_line, errors.error_message
+        from temp.{table_name}_rejects_errors errors
+            join temp.{table_name}_rejects_scans scans using (scan_id, file_id)
+        order by scans.file_path, errors.line
+    """
+    ).fetchone()[0]
     duckdb_conn.execute(
         f"""
-        create table {table_name}_t as
-        select {','.join(column_selection)}
-        from {table_name} it
+        update file_import_metadata
+            set rejected_row_count = {rejected_row_count},
+            rejects_table_name = '{IMPORT_REJECTS_PREFIX}{import_id}'
+        where id = {import_id}
+    """
+    )
+    duckdb_conn.execute(f"drop table temp.{table_name}_rejects_errors")
+    duckdb_conn.execute(f"drop table temp.{table_name}_rejects_scans")
+
+
+def get_import_rejects(table_name: str) -> tuple:
+    # the rejected row count and the rejects table of the last import into the table
+    duckdb_conn = get_import_conn()
+    return (
+        duckdb_conn.execute(
+            f"""
+        select rejected_row_count, rejects_table_name
+        from file_import_metadata
+        where table_name in ('{table_name}_t', '{table_name}_base_t')
+        and parent_id is null
+        order by id desc
+        limit 1
+    """
+        ).fetchone()
+        or (None, None)
+    )
+
+
+def set_import_phase(table_name: str, phase: str):
+    duckdb_conn = get_import_conn()
+    duckdb_conn.execute(
+        f"update file_import_metadata set phase = '{phase}' where id = {get_import_id(table_name=table_name)}"
+    )
+
+
+def end_import(table_name: str, row_count: int):
+    duckdb_conn = get_import_conn()
+    duckdb_conn.execute(
+        f"""
+        update file_import_metadata
+            set end_import_datetime = current_timestamp,
+            row_count = {row_count},
+            status = 'finished',
+            phase = 'finished'
+        where id = {get_import_id(table_name=table_name)}
     """
     )
 
+
+def fail_import(table_name: str):
+    # only an import which started and did not end is marked, a failure before its start leaves the metadata as is
+    duckdb_conn = get_import_conn()
     duckdb_conn.execute(
         f"""
         update file_import_metadata
-            set end_import_datetime = current_timestamp
+            set status = 'failed'
         where table_name = '{table_name}_t'
-        and id = (select max(id) from file_import_metadata where table_name = '{table_name}_t')
+        and parent_id is null
+        and status = 'running'
     """
     )
 
+
+def get_table_column_types(table_name: str) -> dict[str, str]:
+    duckdb_conn = get_import_conn()
+    return dict(
+        duckdb_conn.execute(
+            f"""
+            select column_name, data_type from duckdb_columns where table_name = '{table_name}_t' order by column_index
+        """
+        ).fetchall()
+    )
+
+
+def get_enum_type(values: list[str]) -> str:
+    return "ENUM(" + ",".join(quote_sql_string(value=value) for value in values) + ")"
+
+
+def get_narrowed_column_types(table_name: str) -> dict[str, str]:
+    # the final table is profiled in one scan, text with few distinct values becomes an enum,
+    # integers and doubles get the smallest type which holds all their values exactly
+    duckdb_conn = get_import_conn()
+    column_types = get_table_column_types(table_name=table_name)
+    profile_expressions = {}
+    for column_name, data_type in column_types.items():
+        match data_type:
+            case "VARCHAR":
+                profile_expressions[column_name] = [f'approx_count_distinct("{column_name}")']
+            case "BIGINT" | "INTEGER":
+                profile_expressions[column_name] = [f'min("{column_name}")', f'max("{column_name}")']
+            case "DOUBLE":
+                profile_expressions[column_name] = [
+                    f'bool_and(isfinite("{column_name}"))',
+                    f'max(abs("{column_name}"))',
+                    *[
+                        f'bool_and(round("{column_name}", {scale}) = "{column_name}")'
+                        for scale in range(IMPORT_DECIMAL_MAX_SCALE + 1)
+                    ],
+                ]
+    if not profile_expressions:
+        return {}
+
+    table_profile = iter(
+        duckdb_conn.execute(
+            f"""
+            select count(*), {','.join(chain.from_iterable(profile_expressions.values()))}
+            from {table_name}_t
+        """
+        ).fetchone()
+    )
+    row_count = next(table_profile)
+    column_profiles = {
+        column_name: [next(table_profile) for _ in expressions]
+        for column_name, expressions in profile_expressions.items()
+    }
+
+    narrowed_column_types = {}
+    enum_columns = []
+    for column_name, column_profile in column_profiles.items():
+        match column_profile:
+            case [approx_distinct_count] if approx_distinct_count <= min(IMPORT_ENUM_MAX_CARDINALITY, row_count / 2):
+                enum_columns.append(column_name)
+            case [min_value, max_value] if min_value is not None and -(2**15) <= min_value and max_value < 2**15:
+                narrowed_column_types[column_name] = "SMALLINT"
+            case [min_value, max_value] if min_value is not None and -(2**31) <= min_value and max_value < 2**31:
+                narrowed_column_types[column_name] = "INTEGER"
+            case [True, max_value, *is_rounded] if True in is_rounded:
+                scale = is_rounded.index(True)
+                width = len(str(int(max_value))) + scale
+                if width <= 18:
+                    narrowed_column_types[column_name] = f"DECIMAL({width},{scale})"
+
+    if enum_columns:
+        # the values are sorted, an enum column is ordered the same as the text it replaces
+        enum_expressions = [
+            f'array_agg(distinct "{column_name}" order by "{column_name}") filter (where "{column_name}" is not null)'
+            for column_name in enum_columns
+        ]
+        enum_values = duckdb_conn.execute(f"select {','.join(enum_expressions)} from {table_name}_t").fetchone()
+        narrowed_column_types.update(
+            {
+                column_name: get_enum_type(values=values)
+                for column_name, values in zip(enum_columns, enum_values)
+                if values and len(values) <= IMPORT_ENUM_MAX_CARDINALITY
+            }
+        )
+    return {
+        column_name: data_type
+        for column_name, data_type in narrowed_column_types.items()
+        if data_type != column_types[column_name]
+    }
+
+
+def cast_table_columns(table_name: str, column_types: dict[str, str]):
+    # rewrites the table in the same row order, the other columns are copied as they are
+    duckdb_conn = get_import_conn()
+    column_selection = [
+        (
+            f'"{column_name}"::{column_types[column_name]} as "{column_name}"'
+            if column_name in column_types
+            else f'"{column_name}"'
+        )
+        for column_name in get_table_column_types(table_name=table_name)
+    ]
+    duckdb_conn.execute(
+        f"create or replace table {table_name}_t as select {','.join(column_selection)} from {table_name}_t"
+    )
+
+
+def narrow_column_types(table_name: str):
+    # the blocks of the replaced table are freed and reused by the next writes,
+    # staging the data in a temporary table instead would keep all of it in memory
+    duckdb_conn = get_import_conn()
+    narrowed_column_types = get_narrowed_column_types(table_name=table_name)
+    if narrowed_column_types:
+        column_types = get_table_column_types(table_name=table_name)
+        set_import_phase(table_name=table_name, phase="narrowing")
+        cast_table_columns(table_name=table_name, column_types=narrowed_column_types)
+        # the comment of a narrowed column keeps its type from before, to which an append can widen it back
+        for column_name in narrowed_column_types:
+            duckdb_conn.execute(
+                f"""comment on column {table_name}_t."{column_name}"
+                is '{IMPORT_NARROWED_COMMENT}{column_types[column_name]}'"""
+            )
+
+
+def widen_column_types(table_name: str, new_data: DuckDBPyRelation):
+    # only the columns narrowed by the import are widened, and only when the appended values do not fit in them
+    duckdb_conn = get_import_conn()
+    new_data_types = {column_name: str(data_type) for column_name, data_type in zip(new_data.columns, new_data.types)}
+    narrowed_columns = [
+        (column_name, data_type, comment.removeprefix(IMPORT_NARROWED_COMMENT))
+        for column_name, data_type, comment in duckdb_conn.execute(
+            f"""
+            select column_name, data_type, comment from duckdb_columns
+            where table_name = '{table_name}_t' and starts_with(comment, '{IMPORT_NARROWED_COMMENT}')
+        """
+        ).fetchall()
+        if column_name in new_data_types
+    ]
+    if not narrowed_columns:
+        return
+
+    fit_expressions = [
+        f"""bool_and(
+            try_cast("{column_name}" as {data_type})::{new_data_types[column_name]} is not distinct from "{column_name}"
+        )"""
+        for column_name, data_type, _ in narrowed_columns
+    ]
+    is_fitting = duckdb_conn.execute(f"select {','.join(fit_expressions)} from new_data").fetchone()
+    for (column_name, _, widened_data_type), is_column_fitting in zip(narrowed_columns, is_fitting):
+        if is_column_fitting is False:
+            duckdb_conn.execute(f'alter table {table_name}_t alter column "{column_name}" type {widened_data_type}')
+            duckdb_conn.execute(f'comment on column {table_name}_t."{column_name}" is null')
+
+
+@timeit
+@gather_database_size
+def process_imported_data(
+    imported_data: DuckDBPyRelation,
+    table_name: str,
+    add_auto_columns: bool = True,
+    sort_by_date: bool = False,
+    sort_column: str | None = None,
+    narrow_types: bool = False,
+):
+    # the cleaned column names and the auto columns are known from the sniffed schema,
+    # so the final table is written in a single pass over the imported data
+    duckdb_conn = get_import_conn()
+    column_selection = get_column_selection(imported_data=imported_data, add_auto_columns=add_auto_columns)
+    order_by_expression = get_order_by_expression(
+        imported_data=imported_data,
+        column_selection=column_selection,
+        sort_by_date=sort_by_date,
+        sort_column=sort_column,
+    )
+    set_import_phase(table_name=table_name, phase="writing")
+
+    row_count = duckdb_conn.execute(
+        f"""
+        create table {table_name}_t as
+        select {','.join(column_selection)}
+        from imported_data it
+        {order_by_expression}
+    """
+    ).fetchone()[0]
+    if narrow_types:
+        narrow_column_types(table_name=table_name)
+
+    end_import(table_name=table_name, row_count=row_count)
+
     #
     # unique_values_query = " union all ".join(
     #     [
@@ -144,16 +577,266 @@ def process_imported_data(table_name: str, add_auto_columns: bool = True):
     # """
     # )
     #
-    duckdb_conn.execute(f"drop table {table_name}")
 
 
-def import_demo_file():
-    with open(f"{Path(__file__).parent.parent}/demo/demo_file.txt", "r") as demo_file:
-        table_name = get_table_name("demo_file.txt")
-        cleanup_db(table_name=f"{table_name}_t")
-        import_uploaded_file(
-            data_source=BytesIO(demo_file.read().encode()),
-            table_name=table_name,
-            file_name="demo_file.txt",
+@timeit
+@gather_database_size
+def append_imported_data(
+    imported_data: DuckDBPyRelation,
+    table_name: str,
+    add_auto_columns: bool = True,
+    deduplicate_column: str | None = None,
+    sort_by_date: bool = False,
+    sort_column: str | None = None,
+):
+    duckdb_conn = get_import_conn()
+    column_selection = get_column_selection(imported_data=imported_data, add_auto_columns=add_auto_columns)
+    new_data = imported_data.project(",".join(column_selection))
+    order_by_expression = get_order_by_expression(
+        imported_data=imported_data,
+        column_selection=column_selection,
+        sort_by_date=sort_by_date,
+        sort_column=sort_column,
+    )
+    existing_columns = get_table_column_types(table_name=table_name)
+    if not existing_columns:
+        raise ValueError(f"The table {table_name}_t does not exist, it cannot be appended to")
+    unknown_columns = [column for column in new_data.columns if column not in existing_columns]
+    if unknown_columns:
+        raise ValueError(f"The columns {', '.join(unknown_columns)} do not exist in {table_name}_t")
+
+    deduplicate_expression = ""
+    if deduplicate_column:
+        if deduplicate_column not in new_data.columns:
+            raise ValueError(f"The column {deduplicate_column} does not exist in the imported data")
+        deduplicate_expression = f"""
+            where not exists (
+                select 1 from {table_name}_t existing_data
+                where existing_data."{deduplicate_column}" = new_data."{deduplicate_column}"
+            )
+            qualify row_number() over (partition by new_data."{deduplicate_column}") = 1
+        """
+
+    widen_column_types(table_name=table_name, new_data=new_data)
+    set_import_phase(table_name=table_name, phase="writing")
+    row_count = duckdb_conn.execute(
+        f"""
+        insert into {table_name}_t by name
+        select * from new_data
+        {deduplicate_expression}
+        {order_by_expression}
+    """
+    ).fetchone()[0]
+
+    end_import(table_name=table_name, row_count=row_count)
+
+
+def import_zip_member(
+    data_source: Path | str, duckdb_conn: DuckDBPyConnection, table_name: str, add_auto_columns: bool
+) -> tuple:
+    # runs in a worker thread, with its own cursor on the shared database
+    duckdb_cursor = duckdb_conn.cursor()
+    start_import_datetime = datetime.datetime.now()
+    member_data = read_data_source(duckdb_conn=duckdb_cursor, data_source=[data_source])
+    column_selection = get_column_selection(imported_data=member_data, add_auto_columns=add_auto_columns)
+    row_count = duckdb_cursor.execute(
+        f"""
+        insert into {table_name}_t by name
+        select {','.join(column_selection)}
+        from member_data
+    """
+    ).fetchone()[0]
+    duckdb_cursor.close()
+    return Path(data_source).name, start_import_datetime, datetime.datetime.now(), row_count
+
+
+@timeit
+@gather_database_size
+def process_imported_members(
+    imported_data: DuckDBPyRelation,
+    data_source: list[Path],
+    table_name: str,
+    add_auto_columns: bool = True,
+    narrow_types: bool = False,
+):
+    # the final table is created from the union of the member schemas,
+    # after which the members are parsed and appended concurrently
+    duckdb_conn = get_import_conn()
+    column_selection = get_column_selection(imported_data=imported_data, add_auto_columns=add_auto_columns)
+    set_import_phase(table_name=table_name, phase="writing")
+    duckdb_conn.execute(
+        f"""
+        create table {table_name}_t as
+        select {','.join(column_selection)}
+        from imported_data it
+        limit 0
+    """
+    )
+
+    with ThreadPoolExecutor(max_workers=IMPORT_MAX_WORKERS) as executor:
+        member_metadata = list(
+            executor.map(
+                partial(
+                    import_zip_member,
+                    duckdb_conn=duckdb_conn,
+                    table_name=table_name,
+                    add_auto_columns=add_auto_columns,
+                ),
+                data_source,
+            )
+        )
+
+    import_id = get_import_id(table_name=table_name)
+    duckdb_conn.executemany(
+        f"""
+        insert into file_import_metadata
+        (file_name, table_name, start_import_datetime, end_import_datetime, row_count, parent_id)
+            values
+        (?, '{table_name}_t', ?, ?, ?, {import_id})
+    """,
+        member_metadata,
+    )
+    if narrow_types:
+        narrow_column_types(table_name=table_name)
+    end_import(table_name=table_name, row_count=sum(member[3] for member in member_metadata))
+
+
+def create_auto_columns_view(table_name: str):
+    # the auto columns are computed on read, with the same expressions and names as when they are stored
+    duckdb_conn = get_import_conn()
+    column_selection = ["*", *get_auto_column_expressions(imported_data=duckdb_conn.table(f"{table_name}_base_t"))]
+    duckdb_conn.execute(
+        f"""
+        create or replace view {table_name}_t as
+        select {','.join(column_selection)}
+        from {table_name}_base_t
+    """
+    )
+
+
+@timeit
+def run_import(
+    data_source: list[Path] | list[str],
+    file_name: str,
+    table_name: str,
+    content_hash: str | None = None,
+    import_dir: str | None = None,
+    import_mode: str = "overwrite",
+    add_auto_columns: bool = True,
+    deduplicate_column: str | None = None,
+    sort_by_date: bool = False,
+    sort_column: str | None = None,
+    narrow_types: bool = False,
+    virtual_auto_columns: bool = False,
+    store_rejects: bool = False,
+) -> bool:
+    # returns False when the same content was already imported with the same options,
+    # in which case the database is not touched
+    # a sorted import, or one which stores its rejects, reads the files in one pass, instead of concurrently
+    # with virtual auto columns the data is stored in a base table, under a view which adds the auto columns,
+    # when appending the table decides, the rows of a view go to its base table
+    is_virtual = (
+        is_virtual_table(table_name=f"{table_name}_t")
+        if import_mode == "append"
+        else virtual_auto_columns and add_auto_columns
+    )
+    stored_table_name = f"{table_name}_base" if is_virtual else table_name
+    content_hash = get_import_hash(
+        content_hash=content_hash or get_content_hash(data_source[0]),
+        import_options={
+            "import_mode": import_mode,
+            "add_auto_columns": add_auto_columns,
+            "deduplicate_column": deduplicate_column,
+            "sort_by_date": sort_by_date,
+            "sort_column": sort_column,
+            "narrow_types": narrow_types,
+            "virtual_auto_columns": virtual_auto_columns,
+            "store_rejects": store_rejects,
+        },
+    )
+    if is_already_imported(table_name=stored_table_name, content_hash=content_hash):
+        return False
+
+    try:
+        if import_mode == "overwrite":
+            cleanup_db(table_name=f"{table_name}_t")
+            cleanup_db(table_name=f"{stored_table_name}_t")
+        if len(data_source) == 1 and str(data_source[0]).endswith(".zip"):
+            data_source = get_unzipped_data(data_source=Path(data_source[0]), import_dir=import_dir)
+        imported_data = import_uploaded_file(
+            data_source=data_source,
+            table_name=stored_table_name,
+            file_name=file_name,
+            content_hash=content_hash,
+            store_rejects=store_rejects,
         )
-        process_imported_data(table_name=table_name)
+        if import_mode == "append":
+            append_imported_data(
+                imported_data=imported_data,
+                table_name=stored_table_name,
+                add_auto_columns=add_auto_columns and not is_virtual,
+                deduplicate_column=deduplicate_column,
+                sort_by_date=sort_by_date,
+                sort_column=sort_column,
+            )
+        elif len(data_source) > 1 and not (sort_by_date or sort_column or store_rejects):
+            process_imported_members(
+                imported_data=imported_data,
+                data_source=data_source,
+                table_name=stored_table_name,
+                add_auto_columns=add_auto_columns and not is_virtual,
+                narrow_types=narrow_types,
+            )
+        else:
+            process_imported_data(
+                imported_data=imported_data,
+                table_name=stored_table_name,
+                add_auto_columns=add_auto_columns and not is_virtual,
+                sort_by_date=sort_by_date,
+                sort_column=sort_column,
+                narrow_types=narrow_types,
+            )
+        if store_rejects:
+            store_rejected_rows(table_name=stored_table_name)
+        if is_virtual:
+            # also after appending, the view has to see the types of its base table again
+            create_auto_columns_view(table_name=table_name)
+    except Exception:
+        fail_import(table_name=stored_table_name)
+        raise
+    return True
+
+
+def get_path_data_source(path: str) -> tuple[list[str], str]:
+    # expands a local path, a glob or an fsspec url into the files to import and a fingerprint of them,
+    # the files are read in place by duckdb, through fsspec when they are not on the local file system
+    duckdb_conn = get_duckdb_conn()
+    file_system, file_path = url_to_fs(path)
+    file_paths = sorted(file_system.glob(file_path)) if has_magic(file_path) else [file_path]
+    if not file_paths or not all(file_system.isfile(file_path) for file_path in file_paths):
+        raise FileNotFoundError(f"There are no files to import at {path}")
+
+    fingerprint = hashlib.sha256("".join(file_system.ukey(file_path) for file_path in file_paths).encode()).hexdigest()
+    if isinstance(file_system, LocalFileSystem):
+        return file_paths, fingerprint
+
+    if file_system.protocol not in duckdb_conn.list_filesystems():
+        duckdb_conn.register_filesystem(file_system)
+    return [file_system.unstrip_protocol(file_path) for file_path in file_paths], fingerprint
+
+
+def get_path_table_name(path: str) -> str:
+    _, file_path = url_to_fs(path)
+    return get_table_name(Path(file_path).parent.name if has_magic(file_path) else Path(file_path).name)
+
+
+def import_demo_file():
+    table_name = get_table_name("demo_file.txt")
+    if run_import(
+        data_source=[f"{Path(__file__).parent.parent}/demo/demo_file.txt"],
+        file_name="demo_file.txt",
+        table_name=table_name,
+    ):
+        # the results of a view are cached by the base table it reads
+        invalidate_table_cache(table_name=f"{table_name}_t")
+        invalidate_table_cache(table_name=f"{table_name}_base_t")
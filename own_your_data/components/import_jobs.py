@@ -0,0 +1,214 @@
+import queue
+import shutil
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from dataclasses import field
+from pathlib import Path
+
+import duckdb
+import streamlit as st
+
+from own_your_data.components.import_file import get_import_rejects
+from own_your_data.components.import_file import run_import
+from own_your_data.utils import get_duckdb_conn
+from own_your_data.utils import get_tables
+from own_your_data.utils import import_worker
+from own_your_data.utils import invalidate_table_cache
+from own_your_data.utils import logger
+
+IMPORT_JOB_RETENTION_SECONDS = 3600
+
+import_jobs_lock = threading.Lock()
+
+
+@dataclass
+class ImportJob:
+    session_id: uuid.UUID
+    data_source: list[Path] | list[str]
+    file_name: str
+    table_name: str
+    content_hash: str | None = None
+    import_dir: str | None = None  # a temporary directory owned by the job, removed when the job is done
+    import_mode: str = "overwrite"
+    add_auto_columns: bool = True
+    deduplicate_column: str | None = None
+    sort_by_date: bool = False
+    sort_column: str | None = None
+    narrow_types: bool = False
+    virtual_auto_columns: bool = False
+    store_rejects: bool = False
+    status: str = "queued"
+    error: str | None = None
+    is_reported: bool = False
+    end_time: float | None = None
+    timings: list[str] = field(default_factory=list, repr=False)
+    duckdb_cursor: duckdb.DuckDBPyConnection | None = field(default=None, repr=False)
+
+    def get_query_progress(self) -> float:
+        # the cursor is closed by the worker when the job is done, in between the progress is unknown
+        try:
+            return self.duckdb_cursor.query_progress() if self.duckdb_cursor else -1
+        except duckdb.Error:
+            return -1
+
+
+def run_import_job(import_job: ImportJob):
+    duckdb_cursor = get_duckdb_conn().cursor()
+    duckdb_cursor.execute("set enable_progress_bar = true")
+    duckdb_cursor.execute("set enable_progress_bar_print = false")
+    import_job.duckdb_cursor = duckdb_cursor
+    import_worker.duckdb_conn = duckdb_cursor
+    import_worker.timings = import_job.timings
+    import_job.status = "running"
+    try:
+        is_imported = run_import(
+            data_source=import_job.data_source,
+            file_name=import_job.file_name,
+            table_name=import_job.table_name,
+            content_hash=import_job.content_hash,
+            import_dir=import_job.import_dir,
+            import_mode=import_job.import_mode,
+            add_auto_columns=import_job.add_auto_columns,
+            deduplicate_column=import_job.deduplicate_column,
+            sort_by_date=import_job.sort_by_date,
+            sort_column=import_job.sort_column,
+            narrow_types=import_job.narrow_types,
+            virtual_auto_columns=import_job.virtual_auto_columns,
+            store_rejects=import_job.store_rejects,
+        )
+        if is_imported:
+            # the results of a view are cached by the base table it reads
+            invalidate_table_cache(table_name=f"{import_job.table_name}_t")
+            invalidate_table_cache(table_name=f"{import_job.table_name}_base_t")
+        import_job.status = "finished" if is_imported else "skipped"
+    except Exception as error:  # NOQA everything can go wrong
+        logger.exception(f"Import of {import_job.file_name} failed")
+        import_job.error = str(error)
+        import_job.status = "failed"
+    finally:
+        import_worker.duckdb_conn = None
+        import_worker.timings = None
+        import_job.duckdb_cursor = None
+        import_job.end_time = time.monotonic()
+        duckdb_cursor.close()
+        if import_job.import_dir:
+            shutil.rmtree(import_job.import_dir, ignore_errors=True)
+
+
+def process_import_queue(import_queue: queue.Queue):
+    # the jobs run one after the other, two imports into the same table would otherwise overwrite each other
+    while True:
+        run_import_job(import_job=import_queue.get())
+        import_queue.task_done()
+
+
+@st.cache_resource
+def get_import_queue() -> queue.Queue:
+    import_queue = queue.Queue()
+    threading.Thread(target=process_import_queue, args=(import_queue,), name="import-worker", daemon=True).start()
+    return import_queue
+
+
+@st.cache_resource
+def get_import_jobs() -> list[ImportJob]:
+    # shared by the sessions and the reruns, the worker updates the status of the jobs in place
+    return []
+
+
+def prune_import_jobs():
+    # a job is dropped once it is reported, the jobs of a closed session are never reported and are dropped later
+    with import_jobs_lock:
+        get_import_jobs()[:] = [
+            import_job
+            for import_job in get_import_jobs()
+            if not import_job.is_reported
+            and (import_job.end_time is None or time.monotonic() - import_job.end_time < IMPORT_JOB_RETENTION_SECONDS)
+        ]
+
+
+def submit_import_job(import_job: ImportJob):
+    prune_import_jobs()
+    with import_jobs_lock:
+        get_import_jobs().append(import_job)
+    get_import_queue().put(import_job)
+
+
+def get_session_import_jobs(session_id: uuid.UUID) -> list[ImportJob]:
+    return [
+        import_job
+        for import_job in get_import_jobs()
+        if import_job.session_id == session_id and not import_job.is_reported
+    ]
+
+
+def get_import_progress(table_name: str) -> tuple:
+    duckdb_conn = get_duckdb_conn()
+    import_progress = duckdb_conn.execute(
+        f"""
+        select phase, bytes_total
+        from file_import_metadata
+        where table_name in ('{table_name}_t', '{table_name}_base_t')
+        and parent_id is null
+        and status = 'running'
+        order by id desc
+        limit 1
+    """
+    ).fetchone()
+    return import_progress or ("starting", None)
+
+
+def report_import_job(import_job: ImportJob):
+    final_table_name = f"{import_job.table_name}_t"
+    match import_job.status:
+        case "finished":
+            rejected_row_count, rejects_table_name = get_import_rejects(table_name=import_job.table_name)
+            import_message = f"File {import_job.file_name} successfully imported into {final_table_name} table"
+            if rejected_row_count:
+                import_message = (
+                    f"File {import_job.file_name} imported into {final_table_name} table, {rejected_row_count} rows "
+                    f"could not be read, they are stored in {rejects_table_name}"
+                )
+            st.session_state.import_message = ("warning" if rejected_row_count else "success", import_message)
+            st.session_state.table_options = get_tables()
+            st.session_state.index_option = st.session_state.table_options.index(final_table_name)
+        case "skipped":
+            st.session_state.import_message = (
+                "info",
+                f"File {import_job.file_name} has the same content as the last import into {final_table_name}",
+            )
+        case _:
+            st.session_state.import_message = ("error", f"Something went wrong: {import_job.error}")
+    # the timings of the worker are logged in the session which submitted the job
+    worker_logging = "".join(f"{timing}\n" for timing in reversed(import_job.timings))
+    st.session_state.logging = worker_logging + st.session_state.get("logging", "")
+    import_job.is_reported = True
+    prune_import_jobs()
+
+
+@st.fragment(run_every=1)
+def get_import_jobs_components():
+    # polls the jobs of the session, the rest of the app stays usable while they run
+    import_jobs = get_session_import_jobs(session_id=st.session_state.session_id)
+    for import_job in import_jobs:
+        match import_job.status:
+            case "queued":
+                st.caption(f"{import_job.file_name} is waiting to be imported")
+            case "running":
+                phase, bytes_total = get_import_progress(table_name=import_job.table_name)
+                query_progress = max(import_job.get_query_progress(), 0)
+                bytes_total_mib = (bytes_total or 0) / pow(1024, 2)
+                bytes_read = (
+                    f", ~{bytes_total_mib * query_progress / 100:.1f} of {bytes_total_mib:.1f} MiB"
+                    if phase == "writing"
+                    else ""
+                )
+                st.progress(
+                    query_progress / 100, text=f"{import_job.file_name}: {phase}{bytes_read} ({query_progress:.0f}%)"
+                )
+            case _:
+                report_import_job(import_job=import_job)
+
+    if any(import_job.is_reported for import_job in import_jobs):
+        st.rerun(scope="app")
@@ -1,83 +1,277 @@
 import datetime
+import math
 import time
+import uuid
+import weakref
+from functools import partial
 
+import duckdb
+import pyarrow as pa
 import streamlit as st
 from code_editor import code_editor
-from duckdb.duckdb import FatalException
-from duckdb.duckdb import InternalException
 from sqlparse import format as format_sql
 from sqlparse import parse
 from sqlparse.sql import Identifier
+from sqlparse.sql import Statement
 
-from own_your_data.components.chart_configuration import get_cached_plot
-from own_your_data.utils import cache_duckdb_execution
+from own_your_data.utils import SQL_EDITOR_RESULT_PREFIX
+from own_your_data.utils import QueryCancelledError
+from own_your_data.utils import execute_arrow
 from own_your_data.utils import get_duckdb_conn
+from own_your_data.utils import get_result_cache
+from own_your_data.utils import get_table_schema
 from own_your_data.utils import get_tables
 from own_your_data.utils import insert_database_size
+from own_your_data.utils import invalidate_table_cache
+from own_your_data.utils import invalidate_table_schemas
+from own_your_data.utils import run_cancellable_query
+
+SQL_EDITOR_PAGE_ROWS = 1000
+
+
+def get_statement_type(statement: Statement) -> str:
+    # sqlparse does not know the copy statement of duckdb
+    first_token = statement.token_first(skip_cm=True)
+    if first_token is not None and first_token.normalized == "COPY":
+        return "COPY"
+    return statement.get_type()
+
+
+def invalidate_statement_tables(duckdb_conn: duckdb.DuckDBPyConnection, statement: Statement):
+    # only the cached results of the tables named in the statement become stale, the results are keyed
+    # by the tables under the views, so when a view changes or no table of the catalog is named, all of them do;
+    # the names are matched case insensitively, like duckdb does, a name which is not in the catalog is an alias
+    catalog_names = {
+        table_name
+        for (table_name,) in duckdb_conn.execute(
+            "select lower(table_name) from duckdb_tables() union select lower(view_name) from duckdb_views()"
+        ).fetchall()
+    }
+    table_names = [
+        a.get_name().lower()
+        for a in statement.get_sublists()
+        if isinstance(a, Identifier) and a.get_name() and a.get_name().lower() in catalog_names
+    ]
+    for table_name in table_names:
+        invalidate_table_cache(table_name=table_name)
+    if not table_names or any(token.normalized == "VIEW" for token in statement.flatten()):
+        get_result_cache().invalidate()
+
+
+class SessionCursor:
+    # the cursor is closed when the session state holding it is gone, or when it is replaced,
+    # closing it drops its temporary tables, with the stored query results
+    def __init__(self, duckdb_conn: duckdb.DuckDBPyConnection):
+        self.duckdb_conn = duckdb_conn
+        self.cursor = duckdb_conn.cursor()
+        weakref.finalize(self, self.cursor.close)
+
+
+def get_session_cursor() -> duckdb.DuckDBPyConnection:
+    # the statements of a session run on a cursor of its own, a long statement does not block the other sessions
+    # and is interrupted alone, the temporary tables and the settings stay in the session
+    duckdb_conn = get_duckdb_conn()
+    session_cursor = st.session_state.get("session_cursor")
+    if session_cursor is None or session_cursor.duckdb_conn is not duckdb_conn:
+        session_cursor = SessionCursor(duckdb_conn=duckdb_conn)
+        st.session_state.session_cursor = session_cursor
+    return session_cursor.cursor
+
+
+def get_result_table_name(session_id: uuid.UUID, statement_index: int) -> str:
+    return f"{SQL_EDITOR_RESULT_PREFIX}{session_id.hex}_{statement_index}"
+
+
+def store_query_result(duckdb_conn: duckdb.DuckDBPyConnection, sql_query: str, result_table_name: str) -> int | None:
+    # the rows of a query stay in duckdb, which spills them to disk when needed, only a page at a time is fetched;
+    # a statement which is not a query cannot be stored
+    try:
+        duckdb_conn.execute(f"create or replace temp table {result_table_name} as {sql_query}")
+    except duckdb.ParserException:
+        return None
+    return duckdb_conn.execute(f"select count(*) from {result_table_name}").fetchone()[0]
+
+
+def execute_statement(duckdb_conn: duckdb.DuckDBPyConnection, sql_query: str) -> tuple[bool, pa.Table]:
+    # a query is fetched up to the first row after its first page, which tells if it has other pages,
+    # they are only stored when they are shown; the other statements return their whole result
+    if duckdb_conn.extract_statements(sql_query)[-1].type != duckdb.StatementType.SELECT:
+        return False, execute_arrow(duckdb_conn=duckdb_conn, sql_query=sql_query)
+    return True, pa.table(duckdb_conn.sql(sql_query).limit(SQL_EDITOR_PAGE_ROWS + 1).arrow())
+
+
+def get_query_result_page(duckdb_conn: duckdb.DuckDBPyConnection, result_table_name: str, page: int) -> pa.Table:
+    return execute_arrow(
+        duckdb_conn=duckdb_conn,
+        sql_query=f"""
+            from {result_table_name}
+            limit {SQL_EDITOR_PAGE_ROWS} offset {(page - 1) * SQL_EDITOR_PAGE_ROWS}
+        """,
+    )
+
+
+def drop_query_results():
+    duckdb_conn = get_session_cursor()
+    for message_type, message in st.session_state.get("sql_messages", []):
+        if message_type == "result":
+            result_table_name, _, _, _ = message
+            duckdb_conn.execute(f"drop table if exists {result_table_name}")
+            st.session_state.pop(f"{result_table_name}_page", None)
+            st.session_state.pop(f"{result_table_name}_row_count", None)
+    st.session_state.sql_messages = []
 
 
-@st.cache_resource(hash_funcs={dict: lambda response: response.get("id")})
 def execute_sql(sql_editor):
-    if sql_editor.get("type") == "submit":
-        sql_query = sql_editor.get("text")
-        duckdb_conn = get_duckdb_conn()
-        for statement in parse(sql_editor.get("selected") or sql_query):
-            if statement.get_type() in ["DROP", "ALTER"]:
-                table_name = [a.get_name() for a in statement.get_sublists() if isinstance(a, Identifier)]
-                if list(
-                    {"file_import_metadata", "calendar_t", "database_size_monitoring"}.intersection(set(table_name))
-                ):
-                    st.error(f"You are not allowed to modify {table_name[0]} table!")
-                    continue
-            try:
-                start_time = time.perf_counter()
-                df = duckdb_conn.execute(str(statement)).df()
-                end_time = time.perf_counter()
-                st.info(f"Execution time: {(end_time - start_time) * 1000: .4f} ms")
-                insert_database_size()
-                st.info(statement.get_type())
-                st.dataframe(df, hide_index=True, height=200, use_container_width=True)
-                if statement.get_type() in ["INSERT", "CREATE", "DELETE", "DROP", "CREATE OR REPLACE"]:
-                    get_cached_plot.clear()
-                    cache_duckdb_execution.clear()
-            except (InternalException, FatalException):
-                st.error("There is a fatal error in duckdb, the below SQL cannot be executed!")
-                st.code(statement)
-                duckdb_conn.close()
-                get_duckdb_conn.clear()
-            except Exception as error:
-                st.error(error)
-
-        st.session_state.sql_code = format_sql(sql_query)
-        st.session_state.table_options = get_tables()
-        st.session_state.index_option = None
+    # a submit is executed once and its messages are shown by every rerun; it is recorded before its statements run,
+    # so a run stopped by the cancel button, or any other rerun of the session, does not execute them again
+    if sql_editor.get("type") != "submit" or sql_editor.get("id") == st.session_state.get("sql_editor_id"):
+        return
+    st.session_state.sql_editor_id = sql_editor.get("id")
+    st.session_state.is_sql_running = True
+    sql_query = sql_editor.get("text")
+    drop_query_results()
+    sql_messages = st.session_state.sql_messages
+    duckdb_cursor = get_session_cursor()
+    for statement_index, statement in enumerate(parse(sql_editor.get("selected") or sql_query), start=1):
+        if statement.get_type() in ["DROP", "ALTER"]:
+            table_name = [a.get_name() for a in statement.get_sublists() if isinstance(a, Identifier)]
+            if list({"file_import_metadata", "calendar_t", "database_size_monitoring"}.intersection(set(table_name))):
+                sql_messages.append(("error", f"You are not allowed to modify {table_name[0]} table!"))
+                continue
+        try:
+            start_time = time.perf_counter()
+            result_table_name = get_result_table_name(
+                session_id=st.session_state.session_id, statement_index=statement_index
+            )
+            is_query, result = run_cancellable_query(
+                duckdb_cursor=duckdb_cursor,
+                query_function=partial(execute_statement, duckdb_conn=duckdb_cursor, sql_query=str(statement)),
+                sql_query=str(statement),
+                cancel_key=f"cancel_sql_editor_{statement_index}",
+            )
+            end_time = time.perf_counter()
+            sql_messages.append(("info", f"Execution time: {(end_time - start_time) * 1000: .4f} ms"))
+            insert_database_size()
+            sql_messages.append(("info", statement.get_type()))
+            if is_query:
+                sql_messages.append(("result", (result_table_name, statement_index, str(statement), result)))
+            else:
+                sql_messages.append(("dataframe", result))
+            # insert or replace is an insert for sqlparse
+            if get_statement_type(statement=statement) in [
+                "INSERT",
+                "UPDATE",
+                "DELETE",
+                "CREATE",
+                "DROP",
+                "ALTER",
+                "CREATE OR REPLACE",
+                "COPY",
+                "TRUNCATE",
+                "MERGE",
+            ]:
+                invalidate_statement_tables(duckdb_conn=duckdb_cursor, statement=statement)
+            if statement.get_type() in ["CREATE", "DROP", "ALTER", "CREATE OR REPLACE"]:
+                invalidate_table_schemas()
+        except (duckdb.InternalException, duckdb.FatalException):
+            sql_messages.append(("error", "There is a fatal error in duckdb, the below SQL cannot be executed!"))
+            sql_messages.append(("code", str(statement)))
+            get_duckdb_conn().close()
+            get_duckdb_conn.clear()
+        except QueryCancelledError as error:
+            # the statements after a cancelled one may depend on it, they are not executed
+            sql_messages.append(("error", f"{error}, the statements after it were not executed"))
+            break
+        except Exception as error:
+            sql_messages.append(("error", str(error)))
+
+    st.session_state.is_sql_running = False
+    st.session_state.sql_code = format_sql(sql_query)
+    st.session_state.table_options = get_tables()
+    st.session_state.index_option = None
+
+
+def display_query_result(
+    duckdb_conn: duckdb.DuckDBPyConnection,
+    result_table_name: str,
+    statement_index: int,
+    sql_query: str,
+    first_page: pa.Table,
+):
+    if first_page.num_rows <= SQL_EDITOR_PAGE_ROWS:
+        st.dataframe(first_page, hide_index=True, height=200, use_container_width=True)
+        st.caption(f"{first_page.num_rows} rows")
+        return
+
+    page = st.number_input(f"Page of statement {statement_index}", min_value=1, key=f"{result_table_name}_page")
+    row_count_key = f"{result_table_name}_row_count"
+    if page > 1 and row_count_key not in st.session_state:
+        # the query is executed again, its result is stored and counted for the pages after the first one
+        try:
+            st.session_state[row_count_key] = run_cancellable_query(
+                duckdb_cursor=duckdb_conn,
+                query_function=partial(
+                    store_query_result,
+                    duckdb_conn=duckdb_conn,
+                    sql_query=sql_query,
+                    result_table_name=result_table_name,
+                ),
+                sql_query=sql_query,
+                cancel_key=f"cancel_sql_editor_page_{statement_index}",
+            )
+        except (QueryCancelledError, duckdb.Error) as error:
+            st.warning(f"The other pages of statement {statement_index} cannot be shown: {error}")
+            return
+    row_count = st.session_state.get(row_count_key)
+    if page > 1 and row_count is None:
+        st.warning(f"The statement {statement_index} is not a query, only its first page can be shown")
+        return
+
+    if page == 1:
+        result = first_page.slice(0, SQL_EDITOR_PAGE_ROWS)
+    else:
+        page = min(page, max(math.ceil(row_count / SQL_EDITOR_PAGE_ROWS), 1))
+        try:
+            result = get_query_result_page(duckdb_conn=duckdb_conn, result_table_name=result_table_name, page=page)
+        except duckdb.CatalogException:
+            st.warning(f"The result of statement {statement_index} is no longer available, execute it again")
+            return
+    st.dataframe(result, hide_index=True, height=200, use_container_width=True)
+    first_row = (page - 1) * SQL_EDITOR_PAGE_ROWS + 1
+    total_rows = row_count if row_count is not None else f"more than {SQL_EDITOR_PAGE_ROWS}"
+    st.caption(f"Rows {first_row} to {first_row - 1 + result.num_rows} of {total_rows}")
+
+
+def display_sql_messages():
+    # the pages of the query results are fetched by every rerun
+    duckdb_conn = get_session_cursor()
+    for message_type, message in st.session_state.get("sql_messages", []):
+        match message_type:
+            case "info":
+                st.info(message)
+            case "error":
+                st.error(message)
+            case "code":
+                st.code(message)
+            case "dataframe":
+                st.dataframe(message, hide_index=True, height=200, use_container_width=True)
+            case "result":
+                display_query_result(duckdb_conn, *message)
+    if st.session_state.get("is_sql_running"):
+        st.warning("The execution was stopped, the statements from the running one on were not executed")
 
 
 def display_duckdb_catalog():
     st.subheader("Data Catalogue", anchor=False)
     search = st.text_input("Search for a table or column")
-    duckdb_conn = get_duckdb_conn()
-    if not search:
-        for table in st.session_state.table_options:
-            with st.expander(table):
-                for col in duckdb_conn.execute(
-                    f"select column_name from duckdb_columns where table_name = '{table}' order by column_name"
-                ).fetchall():
-                    st.markdown(f"- {col[0]}")
-    else:
-        for table in duckdb_conn.execute(
-            f"""
-            select distinct table_name
-                from duckdb_columns
-            where column_name ilike '%{search}%' or table_name ilike '%{search}%'
-            order by table_name
-        """
-        ).fetchall():
-            with st.expander(table[0]):
-                for col in duckdb_conn.execute(
-                    f"select column_name from duckdb_columns where table_name = '{table[0]}' order by column_name"
-                ).fetchall():
-                    st.markdown(f"- {col[0]}")
+    for table in st.session_state.table_options:
+        table_schema = get_table_schema(table_name=table)
+        columns = sorted(table_schema.columns) if table_schema else []
+        if search and not any(search.lower() in name.lower() for name in [table, *columns]):
+            continue
+        with st.expander(table):
+            for column in columns:
+                st.markdown(f"- {column}")
 
 
 def get_code_editor():
@@ -107,7 +301,7 @@ def get_code_editor():
         },
     ]
     sql_editor = code_editor(
-        code="-- write your SQL here \n-- there is no limit added to select statements \n",
+        code=f"-- write your SQL here \n-- the results of queries are shown {SQL_EDITOR_PAGE_ROWS} rows per page \n",
         lang="sql",
         buttons=execution_buttons,
         # completions=[{"caption": table, "value": table} for table in st.session_state.table_options],
@@ -116,6 +310,7 @@ def get_code_editor():
     )
 
     execute_sql(sql_editor)
+    display_sql_messages()
 
     if st.session_state.sql_code:
         download_col.download_button(
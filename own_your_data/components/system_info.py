@@ -8,6 +8,7 @@ import streamlit as st
 from own_your_data.charts.constants import SupportedAggregationMethods
 from own_your_data.charts.definition import LineChart
 from own_your_data.utils import get_duckdb_conn
+from own_your_data.utils import get_result_cache
 
 
 @st.cache_resource()
@@ -56,6 +57,24 @@ def get_system_info():
     duckdb_wal_size_col.metric("DuckDB WAL Size", value=duckdb_size["wal_size"][0])
     duckdb_memory_size_col.metric("DuckDB Memory Usage", value=duckdb_size["memory_usage"][0])
 
+    result_cache_stats = get_result_cache().get_stats()
+    (
+        result_cache_size_col,
+        result_cache_entries_col,
+        result_cache_hits_col,
+        result_cache_misses_col,
+        result_cache_evictions_col,
+    ) = st.columns(5, gap="small", vertical_alignment="center")
+    result_cache_size_col.metric(
+        "Result Cache Size (MiB)",
+        value=f"{result_cache_stats['size'] / pow(1024, 2):.1f} / {result_cache_stats['max_size'] / pow(1024, 2):.0f}",
+        help="The cached query results and charts, the least recently used are evicted when the budget is exceeded",
+    )
+    result_cache_entries_col.metric("Result Cache Entries", value=result_cache_stats["entries"])
+    result_cache_hits_col.metric("Result Cache Hits", value=result_cache_stats["hits"])
+    result_cache_misses_col.metric("Result Cache Misses", value=result_cache_stats["misses"])
+    result_cache_evictions_col.metric("Result Cache Evictions", value=result_cache_stats["evictions"])
+
     memory_usage_chart = LineChart(
         duckdb_conn=duckdb_conn,
         metric_column="memory_usage",
@@ -1,10 +1,13 @@
 import random
-from io import BytesIO
+from datetime import datetime
 from pathlib import Path
 from unittest import mock
 
 import pytest
 
+from own_your_data.charts.constants import LINE_CHART_BUCKETS
+from own_your_data.charts.constants import SCATTER_CHART_DENSITY_BINS
+from own_your_data.charts.constants import SCATTER_CHART_DENSITY_THRESHOLD
 from own_your_data.charts.constants import SupportedAggregationMethods
 from own_your_data.charts.definition import BarChart
 from own_your_data.charts.definition import BaseChart
@@ -16,6 +19,7 @@ from own_your_data.charts.definition import ScatterChart
 from own_your_data.charts.definition import WorldMapChart
 from own_your_data.components.import_file import import_uploaded_file
 from own_your_data.components.import_file import process_imported_data
+from own_your_data.utils import cache_duckdb_execution
 
 test_file_path = f"{Path(__file__).parent}/test_csv.csv"
 
@@ -35,13 +39,12 @@ def duckdb_conn_with_final_csv_data(table_name, duckdb_conn):
     with mock.patch("own_your_data.components.import_file.get_duckdb_conn", return_value=duckdb_conn), mock.patch(
         "own_your_data.utils.get_duckdb_conn", return_value=duckdb_conn
     ):
-        with open(test_file_path, "r") as f:
-            import_uploaded_file(
-                data_source=BytesIO(f.read().encode()),
-                table_name=table_name,
-                file_name="test_csv.csv",
-            )
-            process_imported_data(table_name)
+        imported_data = import_uploaded_file(
+            data_source=[test_file_path],
+            table_name=table_name,
+            file_name="test_csv.csv",
+        )
+        process_imported_data(imported_data=imported_data, table_name=table_name)
     return duckdb_conn
 
 
@@ -86,6 +89,104 @@ def test_generate_bar_chart(duckdb_conn_with_final_csv_data, aggregation, final_
     assert "Monday" in [fig_plot_data["name"] for fig_plot_data in fig_plot.data]
 
 
+@pytest.mark.parametrize("color_scheme, expected_color_scheme", [(["red"] * 7, ["red"] * 7), (["red"] * 6, None)])
+def test_bar_chart_derived_from_data(
+    duckdb_conn_with_final_csv_data, final_table_name, color_scheme, expected_color_scheme
+):
+    bar_chart = BarChart(
+        duckdb_conn=duckdb_conn_with_final_csv_data,
+        metric_column="Amount In EUR",
+        dim_columns=["Register Date Month Name Auto"],
+        color_column="Register Date Day Name Auto",
+        orientation="v",
+        aggregation_method=SupportedAggregationMethods.sum.value,
+        table_name=final_table_name,
+        color_scheme=color_scheme,
+    )
+    assert bar_chart.category_orders == {
+        "Register Date Month Name Auto": [
+            "January",
+            "February",
+            "March",
+            "April",
+            "May",
+            "June",
+            "July",
+            "August",
+            "September",
+            "October",
+            "November",
+            "December",
+        ],
+        "Register Date Day Name Auto": ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"],
+    }
+    assert bar_chart.color_scheme == expected_color_scheme
+
+
+@pytest.mark.parametrize(
+    "time_granularity, expected_time_granularity, expected_rows",
+    [("auto", "day", None), ("month", "month", 12), ("none", None, None)],
+)
+def test_bar_chart_time_granularity(
+    duckdb_conn_with_final_csv_data, final_table_name, time_granularity, expected_time_granularity, expected_rows
+):
+    with mock.patch(
+        "own_your_data.charts.definition.cache_duckdb_execution", wraps=cache_duckdb_execution
+    ) as mock_cache_duckdb_execution:
+        bar_chart = BarChart(
+            duckdb_conn=duckdb_conn_with_final_csv_data,
+            metric_column="Amount In EUR",
+            dim_columns=["Register Date"],
+            color_column=None,
+            orientation="v",
+            aggregation_method=SupportedAggregationMethods.sum.value,
+            table_name=final_table_name,
+            time_granularity=time_granularity,
+        )
+    assert bar_chart.time_granularity == expected_time_granularity
+    # the range of the dates is only queried to pick the granularity of auto
+    assert mock_cache_duckdb_execution.call_count == (2 if time_granularity == "auto" else 1)
+    distinct_dates = duckdb_conn_with_final_csv_data.sql(
+        f"""select count(distinct date_trunc('{expected_time_granularity or "second"}', "Register Date"))
+        from {final_table_name}"""
+    ).fetchone()[0]
+    assert len(bar_chart.data) == (expected_rows or distinct_dates)
+
+
+@pytest.mark.parametrize("aggregation_method", ["sum", "avg", "max"])
+def test_bar_chart_top_n(duckdb_conn_with_final_csv_data, aggregation_method):
+    duckdb_conn_with_final_csv_data.execute(
+        """
+        create or replace table test_top_n_t as
+        select range as customer_id, range % 3 as store, range as amount
+        from range(1000)
+    """
+    )
+    bar_chart = BarChart(
+        duckdb_conn=duckdb_conn_with_final_csv_data,
+        metric_column="amount",
+        dim_columns=["customer_id"],
+        color_column="store",
+        orientation="v",
+        aggregation_method=aggregation_method,
+        table_name="test_top_n_t",
+        top_n=5,
+    )
+    assert bar_chart.category_orders["customer_id"] == ["995", "996", "997", "998", "999", "Other"]
+    assert bar_chart.category_orders["store"] == ["0", "1", "2"]
+    other_amount = bar_chart.data.query("customer_id == 'Other'").groupby("store")["amount"].sum()
+    assert (
+        other_amount.to_dict()
+        == duckdb_conn_with_final_csv_data.sql(
+            f"""select store::varchar as store, {aggregation_method}(amount)::decimal(18, 2) as amount
+        from test_top_n_t where customer_id < 995 group by all"""
+        )
+        .df()
+        .set_index("store")["amount"]
+        .to_dict()
+    )
+
+
 @pytest.mark.parametrize("aggregation", SupportedAggregationMethods.list())
 def test_generate_sankey_chart(duckdb_conn_with_final_csv_data, aggregation, final_table_name):
     sankey_chart = SankeyChart(
@@ -107,6 +208,62 @@ def test_generate_sankey_chart(duckdb_conn_with_final_csv_data, aggregation, fin
     assert fig_plot.data[0]["node"]["y"][labels.index("Monday")] == round(1 / 7, 3)
 
 
+def test_sankey_chart_grouped_values(duckdb_conn_with_final_csv_data, final_table_name):
+    with mock.patch("own_your_data.charts.definition.SANKEY_COLUMN_VALUES_MAX", 3):
+        sankey_chart = SankeyChart(
+            duckdb_conn=duckdb_conn_with_final_csv_data,
+            metric_column="Amount In EUR",
+            dim_columns=["Register Date Month Name Auto", "Register Date Day Name Auto"],
+            color_column=None,
+            orientation=None,
+            aggregation_method=SupportedAggregationMethods.sum.value,
+            table_name=final_table_name,
+        )
+    fig_plot = sankey_chart.plot
+    labels = fig_plot.data[0]["node"]["label"].tolist()
+    assert len(labels) == 2 * (3 + 1)
+    assert labels.count("Other") == 2
+    # the links of the values grouped as Other are summed, the flow keeps its total value
+    total_value = duckdb_conn_with_final_csv_data.execute(
+        f"""
+        select sum(round_total)
+        from (
+            select round(sum(try_cast("Amount In EUR" as decimal)), 2) as round_total
+            from {final_table_name}
+            group by "Register Date Month Name Auto", "Register Date Day Name Auto"
+        )
+    """
+    ).fetchone()[0]
+    assert sum(fig_plot.data[0]["link"]["value"]) == pytest.approx(float(total_value))
+
+
+def test_sankey_chart_grouped_values_avg(duckdb_conn_with_final_csv_data):
+    duckdb_conn_with_final_csv_data.execute(
+        """
+        create or replace table test_sankey_chart_t as
+        select *
+        from (values ('a', 't', 30), ('b', 't', 20), ('c', 't', 5), ('d', 't', 10), ('e', 't', 15)) t(x, y, amount)
+    """
+    )
+    with mock.patch("own_your_data.charts.definition.SANKEY_COLUMN_VALUES_MAX", 2):
+        sankey_chart = SankeyChart(
+            duckdb_conn=duckdb_conn_with_final_csv_data,
+            metric_column="amount",
+            dim_columns=["x", "y"],
+            color_column=None,
+            orientation=None,
+            aggregation_method=SupportedAggregationMethods.avg.value,
+            table_name="test_sankey_chart_t",
+        )
+    # the link of Other is the average of its rows, not the sum of the averages of its values
+    sankey_data = sankey_chart.plot.data[0]
+    labels = sankey_data["node"]["label"].tolist()
+    links = {
+        labels[source]: value for source, value in zip(sankey_data["link"]["source"], sankey_data["link"]["value"])
+    }
+    assert links == {"a": 30, "b": 20, "Other": 10}
+
+
 @pytest.mark.parametrize("aggregation", SupportedAggregationMethods.list())
 def test_generate_line_chart(duckdb_conn_with_final_csv_data, aggregation, final_table_name):
     line_chart = LineChart(
@@ -123,6 +280,34 @@ def test_generate_line_chart(duckdb_conn_with_final_csv_data, aggregation, final
     assert "Monday" in [fig_plot_data["name"] for fig_plot_data in fig_plot.data]
 
 
+@pytest.mark.parametrize("color_column, number_series", [(None, 1), ("series", 2)])
+def test_line_chart_downsampled(duckdb_conn_with_final_csv_data, color_column, number_series):
+    duckdb_conn_with_final_csv_data.execute(
+        """
+        create or replace table test_line_chart_t as
+        select '2024-01-01'::timestamp + to_seconds(range) as observed_at,
+            sin(range / 100) as observed_value,
+            ['a', 'b'][range % 2 + 1] as series
+        from range(50000)
+    """
+    )
+    line_chart = LineChart(
+        duckdb_conn=duckdb_conn_with_final_csv_data,
+        metric_column="observed_value",
+        dim_columns=["observed_at"],
+        color_column=color_column,
+        orientation=None,
+        aggregation_method=SupportedAggregationMethods.none.value,
+        table_name="test_line_chart_t",
+    )
+    assert len(line_chart.data) <= 4 * LINE_CHART_BUCKETS * number_series
+    assert (
+        line_chart.data["observed_value"].max()
+        == duckdb_conn_with_final_csv_data.sql("select max(observed_value) from test_line_chart_t").fetchone()[0]
+    )
+    assert line_chart.data["observed_at"].min() == datetime(2024, 1, 1)
+
+
 @pytest.mark.parametrize("aggregation", SupportedAggregationMethods.list())
 def test_generate_heatmap_chart(duckdb_conn_with_final_csv_data, aggregation, final_table_name):
     heatmap_chart = HeatMapChart(
@@ -140,6 +325,48 @@ def test_generate_heatmap_chart(duckdb_conn_with_final_csv_data, aggregation, fi
     assert fig_plot.data[0]["y"][0] == "January"
 
 
+def test_heatmap_chart_matrix(duckdb_conn_with_final_csv_data):
+    duckdb_conn_with_final_csv_data.execute(
+        """
+        create or replace table test_heatmap_chart_t as
+        select *
+        from (values ('Tuesday', 'b', 1), ('Monday', 'a', 2), ('Monday', 'a', 3), ('Sunday', 'c', 4)) t(x, y, amount)
+    """
+    )
+    with mock.patch("own_your_data.charts.definition.HEATMAP_AXIS_MAX", 2):
+        heatmap_chart = HeatMapChart(
+            duckdb_conn=duckdb_conn_with_final_csv_data,
+            metric_column="amount",
+            dim_columns=["x", "y"],
+            color_column=None,
+            orientation=None,
+            aggregation_method=SupportedAggregationMethods.sum.value,
+            table_name="test_heatmap_chart_t",
+        )
+
+    assert heatmap_chart.x_labels == ["Monday", "Tuesday"]
+    assert heatmap_chart.x_values == 3
+    assert heatmap_chart.y_values == 3
+    assert list(heatmap_chart.plot.data[0]["y"]) == ["a", "b"]
+    assert heatmap_chart.plot.data[0]["z"].tolist() == [[5, 0], [0, 1]]
+
+    # the axes of another chart do not leak into a chart without data
+    empty_heatmap_chart = HeatMapChart(
+        duckdb_conn=duckdb_conn_with_final_csv_data,
+        metric_column="amount",
+        dim_columns=["x", "y"],
+        color_column=None,
+        orientation=None,
+        aggregation_method=SupportedAggregationMethods.sum.value,
+        table_name="test_heatmap_chart_t",
+        filter_column="y",
+        filter_value="d",
+    )
+    assert empty_heatmap_chart.x_labels == []
+    assert empty_heatmap_chart.x_values == 0
+    assert heatmap_chart.x_labels == ["Monday", "Tuesday"]
+
+
 @pytest.mark.parametrize("aggregation", SupportedAggregationMethods.list())
 def test_generate_scatter_chart(duckdb_conn_with_final_csv_data, aggregation, final_table_name):
     scatter_chart = ScatterChart(
@@ -154,6 +381,49 @@ def test_generate_scatter_chart(duckdb_conn_with_final_csv_data, aggregation, fi
     assert scatter_chart.plot
 
 
+@pytest.mark.parametrize(
+    "total_points, density_heatmap, is_density",
+    [(300000, False, False), (300000, True, True), (SCATTER_CHART_DENSITY_THRESHOLD, True, False)],
+)
+def test_scatter_chart_many_points(duckdb_conn_with_final_csv_data, total_points, density_heatmap, is_density):
+    duckdb_conn_with_final_csv_data.execute(
+        f"""
+        create or replace table test_scatter_chart_{total_points}_t as
+        select range % 1000 as x, range // 1000 as y, 1 as amount
+        from range({total_points})
+    """
+    )
+    with mock.patch(
+        "own_your_data.charts.definition.cache_duckdb_execution", wraps=cache_duckdb_execution
+    ) as mock_cache_duckdb_execution:
+        scatter_chart = ScatterChart(
+            duckdb_conn=duckdb_conn_with_final_csv_data,
+            metric_column="amount",
+            dim_columns=["x", "y"],
+            color_column=None,
+            orientation=None,
+            aggregation_method=SupportedAggregationMethods.none.value,
+            table_name=f"test_scatter_chart_{total_points}_t",
+            max_points=1000,
+            density_heatmap=density_heatmap,
+        )
+    assert scatter_chart.total_points == total_points
+    assert scatter_chart.is_density == is_density
+    # the points are counted by the query which samples them, or which bins them
+    assert mock_cache_duckdb_execution.call_count == (2 if density_heatmap and not is_density else 1)
+    if is_density:
+        assert len(scatter_chart.data) == SCATTER_CHART_DENSITY_BINS * SCATTER_CHART_DENSITY_BINS
+        assert scatter_chart.data["Number of points"].sum() == total_points
+        # every bin of the sql is a cell of the heatmap, the points are not binned again
+        assert scatter_chart.plot.data[0].type == "heatmap"
+        assert sum(scatter_chart.plot.data[0].z) == total_points
+        assert len(set(scatter_chart.plot.data[0].x)) == SCATTER_CHART_DENSITY_BINS
+    else:
+        assert len(scatter_chart.data) == 1000
+        assert list(scatter_chart.data.columns) == ["amount", "x", "y"]
+        assert scatter_chart.plot.data[0].type == "scattergl"
+
+
 @pytest.mark.parametrize("aggregation", SupportedAggregationMethods.list())
 def test_generate_world_map_chart(duckdb_conn_with_final_csv_data, aggregation, final_table_name):
     world_map_chart = WorldMapChart(
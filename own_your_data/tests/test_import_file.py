@@ -1,14 +1,27 @@
 from io import BytesIO
 from pathlib import Path
 from unittest import mock
+from zipfile import ZipFile
 
+import fsspec
 import pytest
 from duckdb import CatalogException
+from pyarrow import feather
 
+from own_your_data.components.import_file import append_imported_data
 from own_your_data.components.import_file import cleanup_db
 from own_your_data.components.import_file import get_auto_column_expressions
+from own_your_data.components.import_file import get_import_rejects
+from own_your_data.components.import_file import get_path_data_source
+from own_your_data.components.import_file import get_path_table_name
+from own_your_data.components.import_file import get_table_name
+from own_your_data.components.import_file import get_unzipped_data
 from own_your_data.components.import_file import import_uploaded_file
 from own_your_data.components.import_file import process_imported_data
+from own_your_data.components.import_file import process_imported_members
+from own_your_data.components.import_file import run_import
+from own_your_data.components.import_file import spill_uploaded_file
+from own_your_data.utils import get_tables
 
 test_file_path = f"{Path(__file__).parent}/test_csv.csv"
 
@@ -24,17 +37,16 @@ def final_table_name(table_name):
 
 
 @pytest.fixture(scope="module", autouse=True)
-def duckdb_conn_with_initial_csv_data(duckdb_conn, table_name):
+def imported_csv_data(duckdb_conn, table_name):
     with mock.patch("own_your_data.components.import_file.get_duckdb_conn", return_value=duckdb_conn), mock.patch(
         "own_your_data.utils.get_duckdb_conn", return_value=duckdb_conn
     ):
-        with open(test_file_path, "r") as f:
-            import_uploaded_file(
-                data_source=BytesIO(f.read().encode()),
-                table_name=table_name,
-                file_name="test_csv.csv",
-            )
-        return duckdb_conn
+        imported_data = import_uploaded_file(
+            data_source=[test_file_path],
+            table_name=table_name,
+            file_name="test_csv.csv",
+        )
+        return imported_data
 
 
 def test_import_file(duckdb_conn, table_name):
@@ -42,34 +54,466 @@ def test_import_file(duckdb_conn, table_name):
         "own_your_data.utils.get_duckdb_conn", return_value=duckdb_conn
     ):
         cleanup_db(table_name)
-        with open(test_file_path, "r") as f:
-            import_uploaded_file(
-                data_source=BytesIO(f.read().encode()),
-                table_name=table_name,
-                file_name="test_csv.csv",
-            )
+        imported_data = import_uploaded_file(
+            data_source=[test_file_path],
+            table_name=table_name,
+            file_name="test_csv.csv",
+        )
 
-    assert duckdb_conn.sql(f"select * from {table_name}")
+    assert imported_data.columns == ["register_date", "category", "store", "amount in EuR", "country iso code 3"]
+    with pytest.raises(CatalogException):
+        duckdb_conn.sql(f"select * from {table_name}")
 
 
-def test_get_auto_column_expressions(duckdb_conn_with_initial_csv_data, table_name):
-    with mock.patch(
-        "own_your_data.components.import_file.get_duckdb_conn", return_value=duckdb_conn_with_initial_csv_data
-    ), mock.patch("own_your_data.utils.get_duckdb_conn", return_value=duckdb_conn_with_initial_csv_data):
-        auto_column_expressions = ",".join(get_auto_column_expressions(table_name=table_name))
+def test_get_auto_column_expressions(imported_csv_data):
+    auto_column_expressions = ",".join(get_auto_column_expressions(imported_data=imported_csv_data))
     assert 'monthname("register_date") as "Register Date Month Name Auto"' in auto_column_expressions
     assert 'dayname("register_date") as "Register Date Day Name Auto"' in auto_column_expressions
     assert 'date_part(\'year\', "register_date") as "Register Date Year Auto"' in auto_column_expressions
     assert '"register_date"::date as "Register Date Date Auto"' in auto_column_expressions
 
 
-def test_process_imported_data(duckdb_conn_with_initial_csv_data, table_name, final_table_name):
-    with mock.patch(
-        "own_your_data.components.import_file.get_duckdb_conn", return_value=duckdb_conn_with_initial_csv_data
-    ), mock.patch("own_your_data.utils.get_duckdb_conn", return_value=duckdb_conn_with_initial_csv_data):
-        process_imported_data(table_name)
+def test_process_imported_data(duckdb_conn, imported_csv_data, table_name, final_table_name):
+    with mock.patch("own_your_data.components.import_file.get_duckdb_conn", return_value=duckdb_conn), mock.patch(
+        "own_your_data.utils.get_duckdb_conn", return_value=duckdb_conn
+    ):
+        process_imported_data(imported_data=imported_csv_data, table_name=table_name)
 
     with pytest.raises(CatalogException):
-        duckdb_conn_with_initial_csv_data.sql(f"select * from {table_name}")
+        duckdb_conn.sql(f"select * from {table_name}")
+
+    assert duckdb_conn.sql(f"select count(*) from {final_table_name}").fetchone()[0] == 289
+    assert (
+        duckdb_conn.sql(
+            f"""select count(*) from duckdb_columns
+            where table_name = '{final_table_name}' and column_name in ('Amount In Eur', 'Register Date Date Auto')
+        """
+        ).fetchone()[0]
+        == 2
+    )
+
+
+@pytest.mark.parametrize(
+    "sorted_table_name, sort_by_date, sort_column, expected_order_by",
+    [
+        ("test_sorted_by_date_table_name", True, None, ["Register Date"]),
+        ("test_sorted_by_date_store_table_name", True, "Store", ["Register Date", "Store"]),
+        ("test_sorted_by_day_table_name", False, "Register Date Day Name Auto", ["Register Date Day Name Auto"]),
+    ],
+)
+def test_process_imported_data_sorted(duckdb_conn, sorted_table_name, sort_by_date, sort_column, expected_order_by):
+    with mock.patch("own_your_data.components.import_file.get_duckdb_conn", return_value=duckdb_conn), mock.patch(
+        "own_your_data.utils.get_duckdb_conn", return_value=duckdb_conn
+    ):
+        assert run_import(
+            data_source=[test_file_path],
+            file_name="test_csv.csv",
+            table_name=sorted_table_name,
+            sort_by_date=sort_by_date,
+            sort_column=sort_column,
+        )
+
+    column_selection = ",".join(f'"{column}"' for column in expected_order_by)
+    assert (
+        duckdb_conn.sql(f"select {column_selection} from {sorted_table_name}_t").fetchall()
+        == duckdb_conn.sql(
+            f"select {column_selection} from {sorted_table_name}_t order by {column_selection}"
+        ).fetchall()
+    )
+
+
+def test_process_imported_data_unknown_sort_column(duckdb_conn, imported_csv_data):
+    with mock.patch("own_your_data.components.import_file.get_duckdb_conn", return_value=duckdb_conn), mock.patch(
+        "own_your_data.utils.get_duckdb_conn", return_value=duckdb_conn
+    ):
+        with pytest.raises(ValueError, match="Other Column"):
+            process_imported_data(
+                imported_data=imported_csv_data, table_name="test_unsorted_table_name", sort_column="Other Column"
+            )
+
+
+def test_spill_uploaded_file(tmp_path):
+    with open(test_file_path, "rb") as f:
+        file_path = spill_uploaded_file(data_source=BytesIO(f.read()), file_name="test_csv.csv", import_dir=tmp_path)
+
+    assert file_path == tmp_path / "test_csv.csv"
+    assert file_path.read_bytes() == Path(test_file_path).read_bytes()
+
+
+def test_get_unzipped_data(tmp_path):
+    with ZipFile(tmp_path / "test_zip.zip", "w") as test_zip:
+        test_zip.write(test_file_path, arcname="first.csv")
+        test_zip.write(test_file_path, arcname="nested/second.txt")
+        test_zip.writestr("readme.md", "not imported")
+
+    unzipped_data = get_unzipped_data(data_source=tmp_path / "test_zip.zip", import_dir=tmp_path)
+
+    assert sorted(file_path.name for file_path in unzipped_data) == ["first.csv", "second.txt"]
+    assert all(file_path.exists() for file_path in unzipped_data)
+
+
+def test_process_imported_members(duckdb_conn, tmp_path):
+    with open(test_file_path, "r") as f:
+        lines = f.read().splitlines()
+    (tmp_path / "first.csv").write_text("\n".join(lines))
+    (tmp_path / "second.csv").write_text("\n".join([f"{lines[0]},extra"] + [f"{line},1" for line in lines[1:]]))
+    data_source = [tmp_path / "first.csv", tmp_path / "second.csv"]
+
+    with mock.patch("own_your_data.components.import_file.get_duckdb_conn", return_value=duckdb_conn), mock.patch(
+        "own_your_data.utils.get_duckdb_conn", return_value=duckdb_conn
+    ):
+        imported_data = import_uploaded_file(
+            data_source=data_source, table_name="test_zip_table_name", file_name="test_zip.zip"
+        )
+        process_imported_members(imported_data=imported_data, data_source=data_source, table_name="test_zip_table_name")
+
+    assert duckdb_conn.sql(
+        'select count(*), count("Extra"), count("Register Date Date Auto") from test_zip_table_name_t'
+    ).fetchone() == (578, 289, 578)
+    assert (
+        duckdb_conn.sql(
+            """
+        select member.file_name, member.row_count, archive.row_count
+        from file_import_metadata member
+        join file_import_metadata archive on member.parent_id = archive.id
+        where archive.file_name = 'test_zip.zip'
+        order by member.file_name
+    """
+        ).fetchall()
+        == [("first.csv", 289, 578), ("second.csv", 289, 578)]
+    )
+
+
+@pytest.mark.parametrize("deduplicate_column, expected_row_count", [("Register Date", 289), (None, 578)])
+def test_append_imported_data(duckdb_conn, deduplicate_column, expected_row_count):
+    with mock.patch("own_your_data.components.import_file.get_duckdb_conn", return_value=duckdb_conn), mock.patch(
+        "own_your_data.utils.get_duckdb_conn", return_value=duckdb_conn
+    ):
+        cleanup_db("test_append_table_name_t")
+        for _ in range(2):
+            imported_data = import_uploaded_file(
+                data_source=[test_file_path], table_name="test_append_table_name", file_name="test_csv.csv"
+            )
+            if duckdb_conn.sql("from duckdb_tables where table_name = 'test_append_table_name_t'").fetchone():
+                append_imported_data(
+                    imported_data=imported_data,
+                    table_name="test_append_table_name",
+                    deduplicate_column=deduplicate_column,
+                )
+            else:
+                process_imported_data(imported_data=imported_data, table_name="test_append_table_name")
+
+    assert duckdb_conn.sql("select count(*) from test_append_table_name_t").fetchone()[0] == expected_row_count
+    assert (
+        duckdb_conn.sql(
+            """select row_count from file_import_metadata
+            where table_name = 'test_append_table_name_t' order by id desc limit 1"""
+        ).fetchone()[0]
+        == (expected_row_count - 289)
+    )
+
+
+@pytest.mark.parametrize(
+    "narrowed_table_name, narrow_types, expected_data_types",
+    [
+        (
+            "test_narrowed_table_name",
+            True,
+            [
+                ("Category", "ENUM('ALCOHOL', 'BEVERAGE', 'FOOD', 'SWEETS')"),
+                ("Amount In Eur", "DECIMAL(3,2)"),
+                ("Register Date Year Auto", "SMALLINT"),
+            ],
+        ),
+        (
+            "test_not_narrowed_table_name",
+            False,
+            [("Category", "VARCHAR"), ("Amount In Eur", "DOUBLE"), ("Register Date Year Auto", "BIGINT")],
+        ),
+    ],
+)
+def test_process_imported_data_narrow_types(duckdb_conn, narrowed_table_name, narrow_types, expected_data_types):
+    with mock.patch("own_your_data.components.import_file.get_duckdb_conn", return_value=duckdb_conn), mock.patch(
+        "own_your_data.utils.get_duckdb_conn", return_value=duckdb_conn
+    ):
+        run_import(
+            data_source=[test_file_path],
+            file_name="test_csv.csv",
+            table_name=narrowed_table_name,
+            narrow_types=narrow_types,
+        )
+
+    data_types = duckdb_conn.sql(
+        f"""select column_name, data_type from duckdb_columns
+        where table_name = '{narrowed_table_name}_t'
+        and column_name in ('Category', 'Amount In Eur', 'Register Date Year Auto')
+        order by column_index"""
+    ).fetchall()
+    assert data_types == expected_data_types
+
+
+@pytest.mark.parametrize(
+    "appended_row, narrow_types, expected_data_types",
+    [
+        ("2024-12-31 00:00:00,CHEESE,LIDL,123.456,NLD", True, ("VARCHAR", "DOUBLE")),
+        (
+            "2024-12-31 00:00:00,FOOD,LIDL,1.5,NLD",
+            True,
+            ("ENUM('ALCOHOL', 'BEVERAGE', 'FOOD', 'SWEETS')", "DECIMAL(3,2)"),
+        ),
+        ("2024-12-31 00:00:00,CHEESE,LIDL,123.456,NLD", False, ("VARCHAR", "DOUBLE")),
+    ],
+)
+def test_append_imported_data_narrowed_types(duckdb_conn, tmp_path, appended_row, narrow_types, expected_data_types):
+    (tmp_path / "appended.csv").write_text(Path(test_file_path).read_text().splitlines()[0] + f"\n{appended_row}\n")
+    with mock.patch("own_your_data.components.import_file.get_duckdb_conn", return_value=duckdb_conn), mock.patch(
+        "own_your_data.utils.get_duckdb_conn", return_value=duckdb_conn
+    ):
+        run_import(
+            data_source=[test_file_path],
+            file_name="test_csv.csv",
+            table_name="test_append_narrowed_table_name",
+            narrow_types=narrow_types,
+        )
+        run_import(
+            data_source=[tmp_path / "appended.csv"],
+            file_name="appended.csv",
+            table_name="test_append_narrowed_table_name",
+            import_mode="append",
+        )
+
+    assert (
+        duckdb_conn.sql(
+            """select "Category"::varchar || ',LIDL,' || "Amount In Eur"::double from test_append_narrowed_table_name_t
+        where "Register Date" = '2024-12-31'"""
+        ).fetchone()[0]
+        == appended_row.split(",", 1)[1].rsplit(",", 1)[0]
+    )
+    assert (
+        duckdb_conn.sql(
+            """select data_type from duckdb_columns
+        where table_name = 'test_append_narrowed_table_name_t' and column_name in ('Category', 'Amount In Eur')
+        order by column_index"""
+        ).fetchall()
+        == [(data_type,) for data_type in expected_data_types]
+    )
+
 
-    assert duckdb_conn_with_initial_csv_data.sql(f"select * from {final_table_name}")
+def test_append_imported_data_keeps_native_types(duckdb_conn, tmp_path):
+    duckdb_conn.execute(
+        f"""copy (select 1::smallint as "Quantity", 1.25::decimal(4,2) as "Price")
+        to '{tmp_path / "native.parquet"}' (format parquet)"""
+    )
+    duckdb_conn.execute(
+        f"""copy (select 2::smallint as "Quantity", 2.5::decimal(4,2) as "Price")
+        to '{tmp_path / "appended.parquet"}' (format parquet)"""
+    )
+    with mock.patch("own_your_data.components.import_file.get_duckdb_conn", return_value=duckdb_conn), mock.patch(
+        "own_your_data.utils.get_duckdb_conn", return_value=duckdb_conn
+    ):
+        for file_name, import_mode in (("native.parquet", "overwrite"), ("appended.parquet", "append")):
+            run_import(
+                data_source=[tmp_path / file_name],
+                file_name=file_name,
+                table_name="test_native_table_name",
+                add_auto_columns=False,
+                import_mode=import_mode,
+            )
+
+    assert duckdb_conn.sql(
+        "select column_name, data_type from duckdb_columns where table_name = 'test_native_table_name_t'"
+    ).fetchall() == [("Quantity", "SMALLINT"), ("Price", "DECIMAL(4,2)")]
+    assert duckdb_conn.sql("select count(*) from test_native_table_name_t").fetchone()[0] == 2
+
+
+def test_run_import_virtual_auto_columns(duckdb_conn, tmp_path):
+    (tmp_path / "changed.csv").write_text(Path(test_file_path).read_text() + "2024-12-31 00:00:00,FOOD,LIDL,1,NLD\n")
+    with mock.patch("own_your_data.components.import_file.get_duckdb_conn", return_value=duckdb_conn), mock.patch(
+        "own_your_data.utils.get_duckdb_conn", return_value=duckdb_conn
+    ):
+        for table_name, virtual_auto_columns in (("test_virtual_table_name", True), ("test_stored_table_name", False)):
+            run_import(
+                data_source=[test_file_path],
+                file_name="test_csv.csv",
+                table_name=table_name,
+                narrow_types=False,
+                virtual_auto_columns=virtual_auto_columns,
+            )
+        assert "test_virtual_table_name_t" in get_tables()
+        assert "test_virtual_table_name_base_t" not in get_tables()
+
+        assert duckdb_conn.sql("describe test_virtual_table_name_t").fetchall() == (
+            duckdb_conn.sql("describe test_stored_table_name_t").fetchall()
+        )
+        assert not duckdb_conn.sql(
+            "(from test_virtual_table_name_t except all from test_stored_table_name_t) union all "
+            "(from test_stored_table_name_t except all from test_virtual_table_name_t)"
+        ).fetchall()
+        assert not duckdb_conn.sql(
+            "from duckdb_columns where table_name = 'test_virtual_table_name_base_t' and column_name like '% Auto'"
+        ).fetchall()
+
+        run_import(
+            data_source=[tmp_path / "changed.csv"],
+            file_name="changed.csv",
+            table_name="test_virtual_table_name",
+            import_mode="append",
+        )
+        assert duckdb_conn.sql("select count(*) from test_virtual_table_name_base_t").fetchone()[0] == 289 + 290
+        assert (
+            duckdb_conn.sql(
+                """select "Register Date Day Name Auto" from test_virtual_table_name_t
+            where "Register Date" = '2024-12-31'"""
+            ).fetchall()
+            == [("Tuesday",)]
+        )
+
+        run_import(
+            data_source=[tmp_path / "changed.csv"], file_name="changed.csv", table_name="test_virtual_table_name"
+        )
+        assert duckdb_conn.sql("select count(*) from test_virtual_table_name_t").fetchone()[0] == 290
+        assert not duckdb_conn.sql("from duckdb_tables where table_name = 'test_virtual_table_name_base_t'").fetchall()
+
+
+def test_append_imported_data_unknown_columns(duckdb_conn, tmp_path):
+    (tmp_path / "other.csv").write_text("other_column\n1\n")
+    duckdb_conn.execute('create or replace table test_append_other_table_name_t as select 1 as "Column"')
+    with mock.patch("own_your_data.components.import_file.get_duckdb_conn", return_value=duckdb_conn), mock.patch(
+        "own_your_data.utils.get_duckdb_conn", return_value=duckdb_conn
+    ):
+        with pytest.raises(ValueError, match="Other Column"):
+            append_imported_data(
+                imported_data=duckdb_conn.read_csv(str(tmp_path / "other.csv")),
+                table_name="test_append_other_table_name",
+            )
+
+
+def test_run_import_skips_same_content(duckdb_conn, tmp_path):
+    with mock.patch("own_your_data.components.import_file.get_duckdb_conn", return_value=duckdb_conn), mock.patch(
+        "own_your_data.utils.get_duckdb_conn", return_value=duckdb_conn
+    ):
+        assert run_import(data_source=[test_file_path], file_name="test_csv.csv", table_name="test_hash_table_name")
+        assert not run_import(data_source=[test_file_path], file_name="test_csv.csv", table_name="test_hash_table_name")
+        assert run_import(
+            data_source=[test_file_path],
+            file_name="test_csv.csv",
+            table_name="test_hash_table_name",
+            add_auto_columns=False,
+        )
+
+        (tmp_path / "changed.csv").write_text(
+            Path(test_file_path).read_text() + "2024-12-31 00:00:00,FOOD,LIDL,1,NLD\n"
+        )
+        assert run_import(
+            data_source=[tmp_path / "changed.csv"], file_name="changed.csv", table_name="test_hash_table_name"
+        )
+        # appending the content which overwrote the table is another import
+        assert run_import(
+            data_source=[tmp_path / "changed.csv"],
+            file_name="changed.csv",
+            table_name="test_hash_table_name",
+            import_mode="append",
+        )
+
+    assert duckdb_conn.sql("select count(*) from test_hash_table_name_t").fetchone()[0] == 2 * 290
+    assert (
+        duckdb_conn.sql(
+            "select count(*) from file_import_metadata where table_name = 'test_hash_table_name_t'"
+        ).fetchone()[0]
+        == 4
+    )
+
+
+@pytest.mark.parametrize(
+    "file_name, copy_options",
+    [
+        ("test_file.parquet", "(format parquet)"),
+        ("test_file.ndjson", "(format json)"),
+        ("test_file.csv.gz", "(format csv)"),
+        ("test_file.csv.zst", "(format csv)"),
+        ("test_file.arrow", None),
+    ],
+)
+def test_run_import_file_formats(duckdb_conn, tmp_path, file_name, copy_options):
+    file_path = tmp_path / file_name
+    test_data = duckdb_conn.read_csv(test_file_path)
+    if copy_options:
+        duckdb_conn.execute(f"copy (select * from test_data) to '{file_path}' {copy_options}")
+    else:
+        feather.write_feather(test_data.df(), str(file_path))
+
+    table_name = get_table_name(file_name)
+    with mock.patch("own_your_data.components.import_file.get_duckdb_conn", return_value=duckdb_conn), mock.patch(
+        "own_your_data.utils.get_duckdb_conn", return_value=duckdb_conn
+    ):
+        assert run_import(data_source=[file_path], file_name=file_name, table_name=table_name)
+
+    assert duckdb_conn.sql(
+        f'select count(*), count(distinct "Register Date Date Auto") from {table_name}_t'
+    ).fetchone() == (289, 289)
+
+
+@pytest.mark.parametrize(
+    "path, expected_table_name",
+    [
+        ("/data/exports/*.csv", "file_exports"),
+        ("memory://data/sales.csv.gz", "file_sales_csv_gz"),
+        ("file:///data/sales.parquet", "file_sales_parquet"),
+    ],
+)
+def test_get_path_table_name(path, expected_table_name):
+    assert get_path_table_name(path) == expected_table_name
+
+
+def test_run_import_from_path(duckdb_conn):
+    memory_file_system = fsspec.filesystem("memory")
+    for file_name in ["first.csv", "second.csv"]:
+        memory_file_system.pipe(f"/exports/{file_name}", Path(test_file_path).read_bytes())
+
+    with mock.patch("own_your_data.components.import_file.get_duckdb_conn", return_value=duckdb_conn), mock.patch(
+        "own_your_data.utils.get_duckdb_conn", return_value=duckdb_conn
+    ):
+        file_paths, fingerprint = get_path_data_source("memory://exports/*.csv")
+        assert file_paths == ["memory:///exports/first.csv", "memory:///exports/second.csv"]
+        assert run_import(
+            data_source=file_paths,
+            file_name="memory://exports/*.csv",
+            table_name="file_exports",
+            content_hash=fingerprint,
+        )
+
+        with pytest.raises(FileNotFoundError):
+            get_path_data_source("memory://exports/*.parquet")
+
+    assert duckdb_conn.sql("select count(*) from file_exports_t").fetchone()[0] == 578
+
+
+def test_run_import_store_rejects(duckdb_conn, tmp_path):
+    # the bad lines come after the lines sniffed by duckdb, otherwise they change the sniffed types
+    header, *lines = Path(test_file_path).read_text().splitlines()
+    bad_lines = ["2024-12-31 00:00:00,FOOD,LIDL,1,NLD,extra", "2024-12-31 00:00:00,FOOD,LIDL,not a number,NLD"]
+    (tmp_path / "o'rejects.csv").write_text("\n".join([header, *lines * 80, *bad_lines]) + "\n")
+    with mock.patch("own_your_data.components.import_file.get_duckdb_conn", return_value=duckdb_conn), mock.patch(
+        "own_your_data.utils.get_duckdb_conn", return_value=duckdb_conn
+    ):
+        run_import(
+            data_source=[tmp_path / "o'rejects.csv"],
+            file_name="o'rejects.csv",
+            table_name="test_rejects_table_name",
+            store_rejects=True,
+        )
+        rejected_row_count, rejects_table_name = get_import_rejects(table_name="test_rejects_table_name")
+        assert rejects_table_name not in get_tables()
+
+    assert duckdb_conn.sql("select count(*) from test_rejects_table_name_t").fetchone()[0] == 289 * 80
+    assert rejected_row_count == 2
+    assert duckdb_conn.sql(f"select line, error_type, csv_line from {rejects_table_name}").fetchall() == [
+        (289 * 80 + 2, "TOO MANY COLUMNS", bad_lines[0]),
+        (289 * 80 + 3, "CAST", bad_lines[1]),
+    ]
+
+    with mock.patch("own_your_data.components.import_file.get_duckdb_conn", return_value=duckdb_conn), mock.patch(
+        "own_your_data.utils.get_duckdb_conn", return_value=duckdb_conn
+    ):
+        cleanup_db(table_name="test_rejects_table_name_t")
+    assert not duckdb_conn.execute("select 1 from duckdb_tables where table_name = ?", [rejects_table_name]).fetchone()
@@ -0,0 +1,82 @@
+import shutil
+import time
+import uuid
+from pathlib import Path
+from unittest import mock
+
+import pytest
+
+from own_your_data.components.import_jobs import IMPORT_JOB_RETENTION_SECONDS
+from own_your_data.components.import_jobs import ImportJob
+from own_your_data.components.import_jobs import prune_import_jobs
+from own_your_data.components.import_jobs import run_import_job
+
+test_file_path = f"{Path(__file__).parent}/test_csv.csv"
+
+
+@pytest.fixture(autouse=True)
+def mock_duckdb_conn(duckdb_conn):
+    with mock.patch("own_your_data.components.import_file.get_duckdb_conn", return_value=duckdb_conn), mock.patch(
+        "own_your_data.components.import_jobs.get_duckdb_conn", return_value=duckdb_conn
+    ), mock.patch("own_your_data.utils.get_duckdb_conn", return_value=duckdb_conn):
+        yield
+
+
+def test_run_import_job(duckdb_conn, tmp_path):
+    import_dir = tmp_path / "import_dir"
+    import_dir.mkdir()
+    import_job = ImportJob(
+        session_id=uuid.uuid4(),
+        data_source=[shutil.copy(test_file_path, import_dir)],
+        file_name="test_csv.csv",
+        table_name="test_job_table_name",
+        import_dir=str(import_dir),
+    )
+    # the worker uses the cursor of its job, also for gathering the database size
+    with mock.patch("own_your_data.utils.get_duckdb_conn") as mock_get_duckdb_conn:
+        run_import_job(import_job=import_job)
+
+    assert not mock_get_duckdb_conn.called
+    assert import_job.status == "finished"
+    assert import_job.duckdb_cursor is None
+    assert any("process imported data" in timing for timing in import_job.timings)
+    assert not import_dir.exists()
+    import_metadata = duckdb_conn.sql(
+        """
+        select status, phase, row_count, bytes_total > 0
+        from file_import_metadata
+        where table_name = 'test_job_table_name_t'
+        """
+    ).fetchall()
+    assert import_metadata == [("finished", "finished", 289, True)]
+
+
+def test_run_import_job_failed(duckdb_conn):
+    import_job = ImportJob(
+        session_id=uuid.uuid4(),
+        data_source=[test_file_path],
+        file_name="test_csv.csv",
+        table_name="test_failed_job_table_name",
+        import_mode="append",
+    )
+    run_import_job(import_job=import_job)
+
+    assert import_job.status == "failed"
+    assert "does not exist" in import_job.error
+    assert duckdb_conn.sql(
+        "select status, end_import_datetime from file_import_metadata where table_name = 'test_failed_job_table_name_t'"
+    ).fetchall() == [("failed", None)]
+
+
+def test_prune_import_jobs():
+    import_jobs = [
+        ImportJob(session_id=uuid.uuid4(), data_source=[], file_name=status, table_name=status, status=status)
+        for status in ["running", "reported", "finished", "ended long ago"]
+    ]
+    import_jobs[1].is_reported = True
+    import_jobs[2].end_time = time.monotonic()
+    import_jobs[3].end_time = time.monotonic() - 2 * IMPORT_JOB_RETENTION_SECONDS
+    with mock.patch("own_your_data.components.import_jobs.get_import_jobs", return_value=import_jobs):
+        prune_import_jobs()
+
+    assert [import_job.status for import_job in import_jobs] == ["running", "finished"]
@@ -0,0 +1,134 @@
+import uuid
+from unittest import mock
+
+import duckdb
+import pytest
+from sqlparse import parse
+
+from own_your_data.components.sql_editor import SessionCursor
+from own_your_data.components.sql_editor import execute_sql
+from own_your_data.components.sql_editor import execute_statement
+from own_your_data.components.sql_editor import get_query_result_page
+from own_your_data.components.sql_editor import get_result_table_name
+from own_your_data.components.sql_editor import get_statement_type
+from own_your_data.components.sql_editor import invalidate_statement_tables
+from own_your_data.components.sql_editor import store_query_result
+from own_your_data.utils import QueryCancelledError
+from own_your_data.utils import cache_duckdb_execution
+from own_your_data.utils import get_tables
+
+
+@pytest.fixture(autouse=True)
+def mock_duckdb_conn(duckdb_conn):
+    with mock.patch("own_your_data.components.sql_editor.get_duckdb_conn", return_value=duckdb_conn), mock.patch(
+        "own_your_data.utils.get_duckdb_conn", return_value=duckdb_conn
+    ):
+        yield
+
+
+def test_store_query_result(duckdb_conn):
+    result_table_name = get_result_table_name(session_id=uuid.uuid4(), statement_index=1)
+
+    row_count = store_query_result(
+        duckdb_conn=duckdb_conn,
+        sql_query="from range(2500) order by range desc;",
+        result_table_name=result_table_name,
+    )
+
+    assert row_count == 2500
+    assert result_table_name not in get_tables()
+    with mock.patch("own_your_data.components.sql_editor.SQL_EDITOR_PAGE_ROWS", 1000):
+        first_page = get_query_result_page(duckdb_conn=duckdb_conn, result_table_name=result_table_name, page=1)
+        last_page = get_query_result_page(duckdb_conn=duckdb_conn, result_table_name=result_table_name, page=3)
+    assert first_page.num_rows == 1000
+    assert first_page["range"][0].as_py() == 2499
+    assert last_page["range"].to_pylist() == list(range(499, -1, -1))
+
+
+def test_store_query_result_statement(duckdb_conn):
+    result_table_name = get_result_table_name(session_id=uuid.uuid4(), statement_index=1)
+
+    row_count = store_query_result(
+        duckdb_conn=duckdb_conn, sql_query="create table test_sql_editor_t (c int)", result_table_name=result_table_name
+    )
+
+    assert row_count is None
+    assert "test_sql_editor_t" not in get_tables()
+
+
+@pytest.mark.parametrize(
+    "sql_query, expected_is_query, expected_rows",
+    [
+        ("from range(10_000_000) order by range desc;", True, 1001),
+        ("from range(3)", True, 3),
+        ("insert into test_execute_statement_t values (1), (2)", False, 1),
+    ],
+)
+def test_execute_statement(duckdb_conn, sql_query, expected_is_query, expected_rows):
+    # only the first page of a query is fetched, and one row more, nothing is stored
+    duckdb_conn.execute("create or replace table test_execute_statement_t (c int)")
+    with mock.patch("own_your_data.components.sql_editor.SQL_EDITOR_PAGE_ROWS", 1000):
+        is_query, result = execute_statement(duckdb_conn=duckdb_conn, sql_query=sql_query)
+
+    assert is_query == expected_is_query
+    assert result.num_rows == expected_rows
+    assert duckdb_conn.sql("select count(*) from test_execute_statement_t").fetchone()[0] == (0 if is_query else 2)
+
+
+def test_session_cursor_closed(duckdb_conn):
+    session_cursor = SessionCursor(duckdb_conn=duckdb_conn)
+    duckdb_cursor = session_cursor.cursor
+    result_table_name = get_result_table_name(session_id=uuid.uuid4(), statement_index=1)
+    store_query_result(duckdb_conn=duckdb_cursor, sql_query="from range(10)", result_table_name=result_table_name)
+
+    del session_cursor
+
+    with pytest.raises(duckdb.ConnectionException):
+        duckdb_cursor.execute(f"from {result_table_name}")
+
+
+def test_execute_sql_cancelled(duckdb_conn):
+    class SessionState(dict):
+        __getattr__ = dict.__getitem__
+        __setattr__ = dict.__setitem__
+
+    # a statement cancelled by the timeout stops the execution, the next statements may depend on it
+    session_state = SessionState(session_id=uuid.uuid4())
+    with mock.patch("own_your_data.components.sql_editor.st.session_state", session_state), mock.patch(
+        "own_your_data.components.sql_editor.run_cancellable_query",
+        side_effect=QueryCancelledError("The query was cancelled after the timeout of 1 s"),
+    ) as mock_run_cancellable_query:
+        execute_sql({"type": "submit", "id": "test_execute_sql", "text": "select 1; select 2;"})
+
+    assert mock_run_cancellable_query.call_count == 1
+    assert session_state.sql_messages == [
+        ("error", "The query was cancelled after the timeout of 1 s, the statements after it were not executed")
+    ]
+    assert not session_state.is_sql_running
+
+
+@pytest.mark.parametrize(
+    "table_name, statement, expected_total",
+    [
+        ("test_update_case_t", "update Test_Update_Case_T set id = 2", 2),
+        ("test_copy_case_t", "copy Test_Copy_Case_T from '{file_path}'", 3),
+        ("test_alias_case_t", "update Test_Alias_Case_T alias_t set id = 2", 2),
+    ],
+)
+def test_invalidate_statement_tables(duckdb_conn, tmp_path, table_name, statement, expected_total):
+    # the table is written with another case than it is read with, the cached results are still invalidated
+    duckdb_conn.execute(f"create table {table_name} as select 1 as id")
+    duckdb_conn.execute(f"copy (select 2 as id) to '{tmp_path / 'copy.csv'}'")
+    sql_query = f"select sum(id) as total from {table_name}"
+    assert cache_duckdb_execution(duckdb_conn=duckdb_conn, sql_query=sql_query)["total"][0].as_py() == 1
+
+    parsed_statement = parse(statement.format(file_path=tmp_path / "copy.csv"))[0]
+    duckdb_conn.execute(str(parsed_statement))
+    invalidate_statement_tables(duckdb_conn=duckdb_conn, statement=parsed_statement)
+
+    assert cache_duckdb_execution(duckdb_conn=duckdb_conn, sql_query=sql_query)["total"][0].as_py() == expected_total
+
+
+def test_get_statement_type():
+    assert get_statement_type(statement=parse("copy t from 'a.csv'")[0]) == "COPY"
+    assert get_statement_type(statement=parse("truncate t")[0]) == "TRUNCATE"
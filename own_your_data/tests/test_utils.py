@@ -0,0 +1,144 @@
+import time
+from unittest import mock
+
+import pytest
+
+from own_your_data.utils import QueryCancelledError
+from own_your_data.utils import ResultCache
+from own_your_data.utils import cache_duckdb_execution
+from own_your_data.utils import get_table_schema
+from own_your_data.utils import get_table_version
+from own_your_data.utils import insert_database_size
+from own_your_data.utils import invalidate_table_cache
+from own_your_data.utils import normalize_sql
+from own_your_data.utils import run_cancellable_query
+
+LONG_QUERY = "select count(*) from range(10_000_000_000) where range % 7 = 3"
+
+
+def test_get_table_schema(duckdb_conn):
+    duckdb_conn.execute("create table test_schema_t as select 1 as id, current_date as day, 'a' as name from range(10)")
+    with mock.patch("own_your_data.utils.get_duckdb_conn", return_value=duckdb_conn):
+        table_schema = get_table_schema(table_name="test_schema_t")
+        assert list(table_schema.columns) == ["id", "day", "name"]
+        assert [(column.is_integer, column.is_date, column.is_numeric) for column in table_schema.columns.values()] == [
+            (True, False, True),
+            (False, True, False),
+            (False, False, False),
+        ]
+        assert table_schema.estimated_row_count == 10
+
+        duckdb_conn.execute("alter table test_schema_t add column amount double")
+        assert "amount" not in get_table_schema(table_name="test_schema_t").columns
+        invalidate_table_cache(table_name="test_schema_t")
+        assert get_table_schema(table_name="test_schema_t").columns["amount"].is_numeric
+
+        assert get_table_schema(table_name="test_missing_schema_t") is None
+
+
+def test_result_cache():
+    result_cache = ResultCache(max_bytes=100)
+    result_cache.put(("a",), "a", size=40, table_names={"a_t"})
+    result_cache.put(("b",), "b", size=40, table_names={"b_t"})
+    assert result_cache.get(("a",)) == "a"
+    result_cache.put(("c",), "c", size=40, table_names={"a_t", "b_t"})
+    assert result_cache.get(("b",)) is None
+    result_cache.put(("d",), "d", size=200, table_names={"b_t"})
+    assert result_cache.get(("d",)) is None
+    result_cache.invalidate(table_name="b_t")
+    assert result_cache.get(("a",)) == "a"
+    assert result_cache.get(("c",)) is None
+    assert result_cache.get_stats() == {
+        "entries": 1,
+        "size": 40,
+        "max_size": 100,
+        "hits": 2,
+        "misses": 3,
+        "evictions": 1,
+    }
+
+
+def test_normalize_sql():
+    assert normalize_sql("select  'a  b',\n\t\"c  d\"\nfrom t ") == "select 'a  b', \"c  d\" from t"
+
+
+def test_cache_duckdb_execution(duckdb_conn):
+    duckdb_conn.execute("create table test_cache_base_t as select 1 as id")
+    duckdb_conn.execute("create view test_cache_t as select * from test_cache_base_t")
+    with mock.patch("own_your_data.utils.get_duckdb_conn", return_value=duckdb_conn):
+        assert (
+            cache_duckdb_execution(duckdb_conn=duckdb_conn, sql_query="select count(*) c from test_cache_t")["c"][
+                0
+            ].as_py()
+            == 1
+        )
+        duckdb_conn.execute("insert into test_cache_base_t select 2")
+        assert (
+            cache_duckdb_execution(duckdb_conn=duckdb_conn, sql_query="select count(*) c from test_cache_t")["c"][
+                0
+            ].as_py()
+            == 1
+        )
+        invalidate_table_cache(table_name="test_cache_base_t")
+        assert (
+            cache_duckdb_execution(duckdb_conn=duckdb_conn, sql_query="select count(*) c from test_cache_t")["c"][
+                0
+            ].as_py()
+            == 2
+        )
+
+
+def test_run_cancellable_query(duckdb_conn):
+    duckdb_cursor = duckdb_conn.cursor()
+    assert run_cancellable_query(
+        duckdb_cursor=duckdb_cursor,
+        query_function=lambda: duckdb_cursor.execute("select 42").fetchone(),
+        sql_query="select 42",
+        cancel_key="test_cancel_query",
+    ) == (42,)
+
+    start_time = time.perf_counter()
+    with mock.patch("own_your_data.utils.QUERY_TIMEOUT_SECONDS", 1), pytest.raises(QueryCancelledError):
+        run_cancellable_query(
+            duckdb_cursor=duckdb_cursor,
+            query_function=lambda: duckdb_cursor.execute(LONG_QUERY).fetchone(),
+            sql_query=LONG_QUERY,
+            cancel_key="test_cancel_query",
+        )
+    assert time.perf_counter() - start_time < 5
+    assert duckdb_cursor.execute("select 1").fetchone() == (1,)
+
+
+def test_run_cancellable_query_stopped(duckdb_conn):
+    class StopScript(BaseException):
+        pass
+
+    # streamlit stops the script at the next update of an element when the session reruns
+    duckdb_cursor = duckdb_conn.cursor()
+    with mock.patch("own_your_data.utils.st.empty") as mock_empty, pytest.raises(StopScript):
+        mock_empty.return_value.caption.side_effect = StopScript
+        run_cancellable_query(
+            duckdb_cursor=duckdb_cursor,
+            query_function=lambda: duckdb_cursor.execute(LONG_QUERY).fetchone(),
+            sql_query=LONG_QUERY,
+            cancel_key="test_cancel_query",
+        )
+    assert duckdb_cursor.execute("select 1").fetchone() == (1,)
+
+    with mock.patch("own_your_data.utils.st.session_state", {"test_cancel_query": True}), pytest.raises(
+        QueryCancelledError
+    ):
+        run_cancellable_query(
+            duckdb_cursor=duckdb_cursor,
+            query_function=lambda: duckdb_cursor.execute("select 1").fetchone(),
+            sql_query="select 1",
+            cancel_key="test_cancel_query",
+        )
+
+
+def test_insert_database_size(duckdb_conn):
+    # the chart of the memory usage is not served from the cache after a new observation
+    with mock.patch("own_your_data.utils.get_duckdb_conn", return_value=duckdb_conn):
+        table_version = get_table_version(table_name="database_size_monitoring")
+        insert_database_size()
+        assert get_table_version(table_name="database_size_monitoring") == table_version + 1
@@ -1,21 +1,42 @@
+import concurrent.futures
 import datetime
 import inspect
+import os
+import re
+import threading
 import time
+from collections import OrderedDict
+from dataclasses import dataclass
 from functools import wraps
 from pathlib import Path
+from typing import Callable
 
 import duckdb
+import pandas as pd
+import pyarrow as pa
 import streamlit as st
 from streamlit.logger import get_logger
+from streamlit.runtime.scriptrunner import get_script_run_ctx
 
 logger = get_logger(__name__)
 
+RESULT_CACHE_MAX_BYTES = int(os.environ.get("OWN_YOUR_DATA_RESULT_CACHE_MIB", 512)) * pow(1024, 2)
+SQL_EDITOR_RESULT_PREFIX = "sql_editor_result_"
+IMPORT_REJECTS_PREFIX = "file_import_rejects_"
+QUERY_TIMEOUT_SECONDS = int(os.environ.get("OWN_YOUR_DATA_QUERY_TIMEOUT_SECONDS", 300))
+QUERY_POLL_SECONDS = 0.25
+
+
+import_worker = threading.local()
+
+
+class QueryCancelledError(Exception):
+    pass
+
 
 def timeit(func):
     @wraps(func)
     def timeit_wrapper(*args, **kwargs):
-        if "logging" not in st.session_state:
-            st.session_state.logging = ""
         start_time = time.perf_counter()
         result = func(*args, **kwargs)
         end_time = time.perf_counter()
@@ -26,7 +47,14 @@ def timeit(func):
         additional_message = (
             f" for {chart_configuration.table_name}, {chart_configuration.plot_type}" if chart_configuration else ""
         )
-        st.session_state.logging = f"{execution_time}: {function_name} {additional_message} took {total_time: .4f} ms\n{st.session_state.logging}"  # NOQA
+        timing = f"{execution_time}: {function_name} {additional_message} took {total_time: .4f} ms"
+        if get_script_run_ctx(suppress_warning=True) is None:
+            # the import worker has no session, the timings are kept on its job, which logs them when reported
+            timings = getattr(import_worker, "timings", None)
+            if timings is not None:
+                timings.append(timing)
+            return result
+        st.session_state.logging = f"{timing}\n{st.session_state.get('logging', '')}"
         return result
 
     return timeit_wrapper
@@ -54,14 +82,31 @@ def get_tables():
                             qualify row_number() over (partition by table_name order by id desc) = 1
                         ) fm
                     on src.table_name = fm.table_name
+                -- the base tables of virtual auto columns are only read through their view
+                where not exists (
+                    select 1 from duckdb_views v
+                    where src.table_name = regexp_replace(v.view_name, '_t$', '_base_t')
+                )
+                -- the results of the sql editor are kept in temporary tables, they are not shown,
+                -- neither are the rejected lines of the imports
+                and not starts_with(src.table_name, ?)
+                and not starts_with(src.table_name, ?)
                 order by src.table_name
-                """
+                """,
+            [SQL_EDITOR_RESULT_PREFIX, IMPORT_REJECTS_PREFIX],
         ).fetchall()
     ]
 
 
+def get_import_conn() -> duckdb.DuckDBPyConnection:
+    # an import running in the background worker uses its own cursor, so it does not block the queries of the app
+    duckdb_conn = getattr(import_worker, "duckdb_conn", None)
+    return duckdb_conn if duckdb_conn is not None else get_duckdb_conn()
+
+
 def insert_database_size():
-    duckdb_conn = get_duckdb_conn()
+    # in the import worker the size is gathered on the cursor of the job, not on the connection of the app
+    duckdb_conn = get_import_conn()
     db_size_df = duckdb_conn.execute("pragma database_size").df()  # NOQA
     duckdb_conn.execute(
         """
@@ -80,6 +125,8 @@ def insert_database_size():
         from db_size_df
     """
     )
+    # the chart of the memory usage reads this table
+    invalidate_table_cache(table_name="database_size_monitoring")
 
 
 def gather_database_size(func):
@@ -92,8 +139,8 @@ def gather_database_size(func):
     return gather_database_size_wrapper
 
 
-@gather_database_size
 @st.cache_resource
+@gather_database_size
 def initial_load():
     # TODO: move to database migration
     duckdb_conn = get_duckdb_conn()
@@ -105,10 +152,31 @@ def initial_load():
             file_name varchar,
             table_name varchar,
             start_import_datetime timestamp,
-            end_import_datetime timestamp
+            end_import_datetime timestamp,
+            parent_id integer,
+            row_count bigint,
+            content_hash varchar,
+            status varchar,
+            phase varchar,
+            bytes_total bigint,
+            rejected_row_count bigint,
+            rejects_table_name varchar
         )
     """
     )
+    # databases created by previous versions
+    duckdb_conn.execute("alter table file_import_metadata add column if not exists parent_id integer")
+    duckdb_conn.execute("alter table file_import_metadata add column if not exists row_count bigint")
+    duckdb_conn.execute("alter table file_import_metadata add column if not exists content_hash varchar")
+    duckdb_conn.execute("alter table file_import_metadata add column if not exists status varchar")
+    duckdb_conn.execute("alter table file_import_metadata add column if not exists phase varchar")
+    duckdb_conn.execute("alter table file_import_metadata add column if not exists bytes_total bigint")
+    duckdb_conn.execute("alter table file_import_metadata add column if not exists rejected_row_count bigint")
+    duckdb_conn.execute("alter table file_import_metadata add column if not exists rejects_table_name varchar")
+    # the progress of an import is the progress of its query, the bytes read were never updated while running
+    duckdb_conn.execute("alter table file_import_metadata drop column if exists bytes_read")
+    # imports which were running when the previous process stopped will never finish
+    duckdb_conn.execute("update file_import_metadata set status = 'interrupted' where status = 'running'")
 
     duckdb_conn.execute(
         """
@@ -170,6 +238,253 @@ def get_plotly_colors(plot_color):
     ]
 
 
-@st.cache_data
-def cache_duckdb_execution(_duckdb_conn, sql_query):
-    return _duckdb_conn.execute(sql_query).df()
+@st.cache_resource
+def get_table_versions() -> dict[str, int]:
+    return {}
+
+
+def get_table_version(table_name: str) -> int:
+    # the names of duckdb are case insensitive, the versions are kept by the lower case name
+    return get_table_versions().get(table_name.lower(), 0)
+
+
+def invalidate_table_cache(table_name: str):
+    # the cached results and plots of a table are keyed by its version, bumping it makes only them stale
+    table_versions = get_table_versions()
+    table_versions[table_name.lower()] = table_versions.get(table_name.lower(), 0) + 1
+    get_result_cache().invalidate(table_name=table_name.lower())
+
+
+class ResultCache:
+    # the least recently used results are evicted when the cached results take more memory than the budget
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.results = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+    def get(self, key: tuple):
+        with self.lock:
+            if key not in self.results:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.results.move_to_end(key)
+            return self.results[key][0]
+
+    def put(self, key: tuple, result, size: int, table_names: set[str]):
+        with self.lock:
+            if key in self.results:
+                self.size -= self.results.pop(key)[1]
+            if size > self.max_bytes:
+                return
+            self.results[key] = (result, size, table_names)
+            self.size += size
+            while self.size > self.max_bytes:
+                _, (_, evicted_size, _) = self.results.popitem(last=False)
+                self.size -= evicted_size
+                self.evictions += 1
+
+    def invalidate(self, table_name: str | None = None):
+        # without a table name everything is invalidated
+        with self.lock:
+            for key in [
+                key
+                for key, (_, _, table_names) in self.results.items()
+                if table_name is None or table_name in table_names
+            ]:
+                self.size -= self.results.pop(key)[1]
+
+    def get_stats(self) -> dict:
+        return {
+            "entries": len(self.results),
+            "size": self.size,
+            "max_size": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+@st.cache_resource
+def get_result_cache() -> ResultCache:
+    return ResultCache(max_bytes=RESULT_CACHE_MAX_BYTES)
+
+
+def normalize_sql(sql_query: str) -> str:
+    # the same query formatted differently has the same result, the whitespace in quotes is kept
+    return re.sub(r"""('(?:[^']|'')*'|"(?:[^"]|"")*")|\s+""", lambda match: match.group(1) or " ", sql_query).strip()
+
+
+def get_read_table_names(duckdb_conn: duckdb.DuckDBPyConnection, sql_query: str) -> set[str]:
+    # the views are resolved by duckdb to the tables they read, the names are spelled as in the query
+    try:
+        return {table_name.lower() for table_name in duckdb_conn.get_table_names(sql_query)}
+    except duckdb.Error:
+        return set()
+
+
+def get_read_table_versions(table_names: set[str]) -> tuple:
+    return tuple(sorted((table_name, get_table_version(table_name=table_name)) for table_name in table_names))
+
+
+def execute_arrow(duckdb_conn: duckdb.DuckDBPyConnection, sql_query: str) -> pa.Table:
+    # arrow() returns a table in duckdb 1.1 and a record batch reader in the later versions
+    return pa.table(duckdb_conn.execute(sql_query).arrow())
+
+
+def run_cancellable_query(
+    duckdb_cursor: duckdb.DuckDBPyConnection, query_function: Callable, sql_query: str, cancel_key: str
+):
+    # the query runs on a worker while the script waits for it, the cursor is interrupted when the timeout passes
+    # or when the script is stopped, by the cancel button or any other rerun of the session
+    if st.session_state.get(cancel_key):
+        raise QueryCancelledError("The query was cancelled")
+    start_time = time.perf_counter()
+    cancel_placeholder = st.empty()
+    elapsed_placeholder = st.empty()
+    query_executor = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="query-worker")
+    query_future = query_executor.submit(query_function)
+    is_cancel_shown = False
+    try:
+        while True:
+            try:
+                return query_future.result(timeout=QUERY_POLL_SECONDS)
+            except concurrent.futures.TimeoutError:
+                elapsed_seconds = time.perf_counter() - start_time
+                if elapsed_seconds > QUERY_TIMEOUT_SECONDS:
+                    raise QueryCancelledError(f"The query was cancelled after the timeout of {QUERY_TIMEOUT_SECONDS} s")
+                if not is_cancel_shown:
+                    cancel_placeholder.button("Cancel", key=cancel_key, help="Interrupt the running query")
+                    is_cancel_shown = True
+                # every update gives streamlit the chance to stop the script when the session reruns
+                elapsed_placeholder.caption(f"The query is running for {elapsed_seconds:.0f} s")
+    finally:
+        if not query_future.done():
+            duckdb_cursor.interrupt()
+            logger.warning(f"Query cancelled after {time.perf_counter() - start_time:.1f} s: {sql_query}")
+        query_executor.shutdown(wait=True)
+        cancel_placeholder.empty()
+        elapsed_placeholder.empty()
+
+
+def cache_duckdb_execution(duckdb_conn: duckdb.DuckDBPyConnection, sql_query: str) -> pa.Table:
+    # the results are keyed by the query and the versions of the tables it reads, they are kept as arrow tables
+    result_cache = get_result_cache()
+    table_names = get_read_table_names(duckdb_conn=duckdb_conn, sql_query=sql_query)
+    result_key = ("query", normalize_sql(sql_query), get_read_table_versions(table_names=table_names))
+    result = result_cache.get(result_key)
+    if result is None:
+        # a cursor of its own, a long query neither blocks the connection of the sessions nor is interrupted with it
+        duckdb_cursor = duckdb_conn.cursor()
+        try:
+            result = run_cancellable_query(
+                duckdb_cursor=duckdb_cursor,
+                query_function=lambda: execute_arrow(duckdb_conn=duckdb_cursor, sql_query=sql_query),
+                sql_query=sql_query,
+                cancel_key=f"cancel_query_{hash(sql_query)}",
+            )
+        finally:
+            duckdb_cursor.close()
+        result_cache.put(result_key, result, size=result.nbytes, table_names=table_names)
+    return result
+
+
+def get_pandas_arrow_type(data_type: pa.DataType) -> pa.DataType:
+    if pa.types.is_decimal(data_type):
+        return pa.float64()
+    if pa.types.is_date(data_type):
+        return pa.timestamp("us")
+    if pa.types.is_list(data_type) or pa.types.is_large_list(data_type):
+        return pa.list_(get_pandas_arrow_type(data_type=data_type.value_type))
+    return data_type
+
+
+def arrow_to_pandas(arrow_table: pa.Table) -> pd.DataFrame:
+    # the decimals become floats and the dates datetimes, as in the data frames of duckdb, plotly draws them as numbers
+    pandas_schema = pa.schema(
+        [field.with_type(get_pandas_arrow_type(data_type=field.type)) for field in arrow_table.schema]
+    )
+    return arrow_table.cast(pandas_schema).to_pandas()
+
+
+@dataclass
+class ColumnSchema:
+    column_name: str
+    data_type: str
+    is_integer: bool
+    is_date: bool
+    is_numeric: bool
+
+
+@dataclass
+class TableSchema:
+    table_name: str
+    table_version: int
+    columns: dict[str, ColumnSchema]
+    estimated_row_count: int | None
+
+
+@st.cache_resource
+def get_table_schemas() -> dict[str, TableSchema]:
+    return {}
+
+
+def load_table_schemas(duckdb_conn: duckdb.DuckDBPyConnection) -> dict[str, TableSchema]:
+    # one catalog query for all the tables, the views estimate their rows by their base table
+    table_schemas = {}
+    for table_name, columns, estimated_row_count in duckdb_conn.execute(
+        """
+        select c.table_name,
+            list((c.column_name, c.data_type) order by c.column_index),
+            coalesce(t.estimated_size, bt.estimated_size)
+        from duckdb_columns c
+            left join duckdb_tables t
+                on c.database_name = t.database_name and c.schema_name = t.schema_name and c.table_name = t.table_name
+            left join duckdb_tables bt
+                on c.database_name = bt.database_name and c.schema_name = bt.schema_name
+                and bt.table_name = regexp_replace(c.table_name, '_t$', '_base_t')
+        where c.database_name = current_database()
+        and c.schema_name = 'main'
+        group by all
+    """
+    ).fetchall():
+        table_schemas[table_name] = TableSchema(
+            table_name=table_name,
+            table_version=get_table_version(table_name=table_name),
+            columns={
+                column_name: ColumnSchema(
+                    column_name=column_name,
+                    data_type=data_type,
+                    is_integer=data_type == "INTEGER" or data_type.endswith("INT"),
+                    is_date=data_type == "DATE" or data_type.startswith("TIMESTAMP"),
+                    is_numeric=data_type in ("INTEGER", "FLOAT", "DOUBLE")
+                    or data_type.endswith("INT")
+                    or data_type.startswith("DECIMAL"),
+                )
+                for column_name, data_type in columns
+            },
+            estimated_row_count=estimated_row_count,
+        )
+    return table_schemas
+
+
+def get_table_schema(table_name: str, duckdb_conn: duckdb.DuckDBPyConnection | None = None) -> TableSchema | None:
+    # the schemas are kept per table version, a new or a changed table reloads all of them at once
+    table_schemas = get_table_schemas()
+    table_schema = table_schemas.get(table_name)
+    if table_schema is None or table_schema.table_version != get_table_version(table_name=table_name):
+        loaded_table_schemas = load_table_schemas(duckdb_conn=duckdb_conn or get_duckdb_conn())
+        table_schemas.clear()
+        table_schemas.update(loaded_table_schemas)
+        table_schema = table_schemas.get(table_name)
+    return table_schema
+
+
+def invalidate_table_schemas():
+    # for changes which are not tied to one table, like the statements of the sql editor
+    get_table_schemas().clear()